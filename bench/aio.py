@@ -0,0 +1,46 @@
+""" Serve many concurrent chunk requests through AsyncWorld, compared
+    with the same requests served synchronously by World
+"""
+import os.path
+import asyncio
+import random
+from time import perf_counter
+
+from mynbt.world import World
+from mynbt.aio import AsyncWorld
+
+SAMPLE_WORLD=os.path.join('test','data','MC-1_14_4-World')
+
+REQUESTS=2000
+
+def requests():
+    """ Random requests for the chunks present in the world
+    """
+    world = World(SAMPLE_WORLD)
+    chunks = [ (rx*32+x, rz*32+z) for rx, rz in world.region_coords()
+               for x, z in world.region(rx, rz, lazy=True).present_chunks() ]
+
+    rnd = random.Random(42)
+    return [ rnd.choice(chunks) for _ in range(REQUESTS) ]
+
+def run_sync(positions):
+    world = World(SAMPLE_WORLD)
+    start = perf_counter()
+    for cx, cz in positions:
+        world.chunk(cx, cz).nbt
+
+    return perf_counter() - start
+
+def run_async(positions):
+    async def main():
+        async with AsyncWorld(SAMPLE_WORLD) as world:
+            await asyncio.gather(*(world.chunk(cx, cz) for cx, cz in positions))
+
+    start = perf_counter()
+    asyncio.run(main())
+    return perf_counter() - start
+
+if __name__ == "__main__":
+    positions = requests()
+    for name, fct in (("World", run_sync), ("AsyncWorld", run_async)):
+        print("{:12s} {:8.3f}s for {:d} requests".format(name, fct(positions), len(positions)))
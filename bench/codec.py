@@ -0,0 +1,66 @@
+""" Throughput and compression ratio of the chunk codecs at various
+    levels, measured on the chunks of the sample world
+"""
+import os.path
+import warnings
+from time import perf_counter
+
+from mynbt.world import World
+from mynbt.anvil import parse_chunk_header
+from mynbt.codec import CODECS, NONE, GLIB, ZLIB, LZ4, UnavailableCodecError, codec
+
+SAMPLE_WORLD=os.path.join('test','data','MC-1_14_4-World')
+
+CASES=(
+  (ZLIB, 1), (ZLIB, None), (ZLIB, 9),
+  (GLIB, None),
+  (LZ4, None), (LZ4, 9),
+  (NONE, None),
+)
+
+def payloads():
+    """ The uncompressed NBT data of all the chunks of the sample world
+    """
+    world = World(SAMPLE_WORLD)
+    result = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for rx, rz in world.region_coords():
+            region = world.region(rx, rz)
+            for x, z in region.present_chunks():
+                length, decompressor, data = region.parse_chunk_header(region.chunk_info(x, z))
+                if length:
+                    result.append(decompressor(data))
+
+    return result
+
+def run(payloads, code, level):
+    c = codec(code)
+
+    start = perf_counter()
+    compressed = [ c.compress(data, level) for data in payloads ]
+    compress_time = perf_counter() - start
+
+    start = perf_counter()
+    for data in compressed:
+        c.decompress(data)
+    decompress_time = perf_counter() - start
+
+    return compress_time, decompress_time, sum(map(len, compressed))
+
+if __name__ == "__main__":
+    data = payloads()
+    total = sum(map(len, data))
+    print("{:d} chunks, {:.1f} MiB uncompressed".format(len(data), total/2**20))
+    print("{:6s} {:>5s} {:>12s} {:>12s} {:>7s}".format("codec", "level", "comp MiB/s", "decomp MiB/s", "ratio"))
+    for code, level in CASES:
+        name = CODECS[code].name
+        try:
+            ct, dt, size = run(data, code, level)
+        except UnavailableCodecError as err:
+            print("{:6s} {:>5s} {}".format(name, str(level), err))
+            continue
+
+        print("{:6s} {:>5s} {:12.1f} {:12.1f} {:7.3f}".format(
+            name, str(level), total/2**20/ct, total/2**20/dt, size/total
+        ))
@@ -0,0 +1,36 @@
+""" Save a world-scale fill with the chunk compression done serially
+    or by a thread pool
+"""
+import os
+import os.path
+import shutil
+from time import perf_counter
+
+from mynbt.world import World, ChangeSet
+
+SAMPLE_WORLD=os.path.join('test','data','MC-1_14_4-World')
+COPY_WORLD=os.path.join('test','tmp','bench-compress-World')
+
+XRANGE=range(-128, 128)
+YRANGE=range(0, 64)
+ZRANGE=range(-128, 128)
+BLOCK=dict(Name="minecraft:stone")
+
+def run(workers):
+    shutil.rmtree(COPY_WORLD, ignore_errors=True)
+    shutil.copytree(SAMPLE_WORLD, COPY_WORLD)
+
+    with ChangeSet(World(COPY_WORLD), compress_workers=workers) as editor:
+        editor.fill(XRANGE, YRANGE, ZRANGE, **BLOCK)
+
+        start = perf_counter()
+        for rx, rz in list(editor._cache):
+            editor.release(rx, rz)
+
+    return perf_counter() - start
+
+if __name__ == "__main__":
+    for workers in (1, 4):
+        print("{:2d} worker(s) {:8.3f}s to save".format(workers, run(workers)))
+
+    shutil.rmtree(COPY_WORLD, ignore_errors=True)
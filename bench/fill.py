@@ -0,0 +1,45 @@
+""" Compare a world-scale fill using the Section.fill fast paths
+    with the same fill done one x-row at a time
+"""
+import os.path
+import shutil
+from array import array
+from time import perf_counter
+
+from mynbt.world import World
+from mynbt.section import Section
+
+SAMPLE_WORLD=os.path.join('test','data','MC-1_14_4-World')
+COPY_WORLD=os.path.join('test','tmp','bench-fill-World')
+
+XRANGE=range(-128, 128)
+YRANGE=range(0, 64)
+ZRANGE=range(-128, 128)
+BLOCK=dict(Name="minecraft:stone")
+
+def row_fill(section, xrange, yrange, zrange, **blockstate):
+    """ Section.fill without the fast paths
+    """
+    blk = section.block_state_index(**blockstate)
+    seq = array(section.blocks.typecode, (blk for i in xrange))
+
+    def fct(section, blocks, row, *args):
+        blocks[row] = seq
+
+    section.row_apply(fct, xrange, yrange, zrange)
+
+def run(fct):
+    shutil.rmtree(COPY_WORLD, ignore_errors=True)
+    shutil.copytree(SAMPLE_WORLD, COPY_WORLD)
+
+    start = perf_counter()
+    with World(COPY_WORLD).editor as editor:
+        editor.apply(fct, XRANGE, YRANGE, ZRANGE, **BLOCK)
+
+    return perf_counter() - start
+
+if __name__ == "__main__":
+    for name, fct in (("row by row", row_fill), ("fast path", Section.fill)):
+        print("{:12s} {:8.3f}s".format(name, run(fct)))
+
+    shutil.rmtree(COPY_WORLD, ignore_errors=True)
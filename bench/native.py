@@ -0,0 +1,60 @@
+""" Decoding chunks to plain Python objects: the node tree followed by
+    export(), versus loads(..., mode='native')
+"""
+import os.path
+import warnings
+from time import perf_counter
+
+from mynbt.anvil import Anvil
+from mynbt.nbt import parse, loads, dumps
+
+SAMPLE_REGION=os.path.join('test','data','MC-1_14_4-World','region','r.0.0.mca')
+CHUNKS=16 # export() is slow: only use a few chunks
+REPEAT=3
+
+def payloads():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        region = Anvil.fromFile(0,0,SAMPLE_REGION)
+        result = []
+        for x, z in region.present_chunks():
+            length, decompressor, data = region.parse_chunk_header(region.chunk_info(x, z))
+            payload = decompressor(data)
+            try:
+                parse(payload)
+            except KeyError:
+                continue # the sample region contains a corrupted chunk
+
+            result.append(payload)
+            if len(result) == CHUNKS:
+                break
+
+    return result
+
+def best(fct, data):
+    elapsed = float("inf")
+    for _ in range(REPEAT):
+        start = perf_counter()
+        for payload in data:
+            fct(payload)
+        elapsed = min(elapsed, perf_counter() - start)
+
+    return elapsed
+
+if __name__ == "__main__":
+    data = payloads()
+    total = sum(map(len, data))
+    natives = [ loads(payload) for payload in data ]
+    schemas = [ loads(payload, mode='schema') for payload in data ]
+
+    timings = (
+        ("parse+export", best(lambda payload: parse(payload)[0].export(), data)),
+        ("loads", best(loads, data)),
+        ("dumps", best(lambda i: dumps(natives[i], schema=schemas[i]), range(len(data)))),
+    )
+
+    print("{:d} chunks, {:.1f} MiB".format(len(data), total/2**20))
+    for name, elapsed in timings:
+        print("{:>14s}: {:7.1f} MiB/s {:6.1f}x".format(
+            name, total/2**20/elapsed, timings[0][1]/elapsed
+        ))
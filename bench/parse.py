@@ -0,0 +1,54 @@
+""" Parsing of full chunks: decompressed NBT data to a (proxy) tree
+"""
+import os.path
+import warnings
+from time import perf_counter
+
+from mynbt.anvil import Anvil
+from mynbt.nbt import parse
+
+SAMPLE_REGION=os.path.join('test','data','MC-1_14_4-World','region','r.0.0.mca')
+REPEAT=5
+
+def payloads():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        region = Anvil.fromFile(0,0,SAMPLE_REGION)
+        result = []
+        for x, z in region.present_chunks():
+            length, decompressor, data = region.parse_chunk_header(region.chunk_info(x, z))
+            payload = decompressor(data)
+            try:
+                parse(payload)
+            except KeyError:
+                continue # the sample region contains a corrupted chunk
+
+            result.append(payload)
+
+    return result
+
+def count_tags(node):
+    # walk the storage directly so proxies are not decoded
+    if isinstance(node, dict):
+        return 1 + sum(count_tags(item) for item in dict.values(node))
+    if isinstance(node, list):
+        return 1 + sum(count_tags(item) for item in list.__iter__(node))
+
+    return 1
+
+if __name__ == "__main__":
+    data = payloads()
+    total = sum(map(len, data))
+    tags = sum(count_tags(parse(payload)[0]) for payload in data)
+
+    # keep the best run: the parse time is sensitive to the machine load
+    elapsed = float("inf")
+    for _ in range(REPEAT):
+        start = perf_counter()
+        for payload in data:
+            parse(payload)
+        elapsed = min(elapsed, perf_counter() - start)
+
+    print("{:d} chunks, {:d} tags, {:.1f} MiB: {:.1f} MiB/s, {:.0f} ns per tag".format(
+        len(data), tags, total/2**20, total/2**20/elapsed, elapsed/tags*1e9
+    ))
@@ -0,0 +1,58 @@
+""" Read -> write round trip of unmodified chunks: parsing the
+    decompressed NBT data, then serializing the tree back
+"""
+import os.path
+import warnings
+from time import perf_counter
+
+from mynbt.anvil import Anvil
+from mynbt.nbt import parse
+
+SAMPLE_REGION=os.path.join('test','data','MC-1_14_4-World','region','r.0.0.mca')
+REPEAT=5
+
+class NullOutput:
+    def __init__(self):
+        self.writes = 0
+        self.size = 0
+
+    def write(self, data):
+        self.writes += 1
+        self.size += len(data)
+
+def payloads():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        region = Anvil.fromFile(0,0,SAMPLE_REGION)
+        result = []
+        for x, z in region.present_chunks():
+            length, decompressor, data = region.parse_chunk_header(region.chunk_info(x, z))
+            payload = decompressor(data)
+            try:
+                parse(payload)
+            except KeyError:
+                continue # the sample region contains a corrupted chunk
+
+            result.append(payload)
+
+    return result
+
+def roundtrip(payloads, output):
+    for payload in payloads:
+        tree, name, offset = parse(payload)
+        tree.write_to(output, name)
+
+if __name__ == "__main__":
+    data = payloads()
+    total = sum(map(len, data))
+
+    output = NullOutput()
+    start = perf_counter()
+    for _ in range(REPEAT):
+        roundtrip(data, output)
+    elapsed = (perf_counter() - start)/REPEAT
+
+    assert output.size == total*REPEAT
+    print("{:d} chunks, {:.1f} MiB: {:.1f} MiB/s, {:.1f} writes per chunk".format(
+        len(data), total/2**20, total/2**20/elapsed, output.writes/REPEAT/len(data)
+    ))
@@ -0,0 +1,79 @@
+""" Region write throughput: the previous one-write-per-field path
+    compared with the gathered/vectored Anvil.write_to
+"""
+import io
+import os
+import os.path
+import warnings
+from time import perf_counter
+
+from mynbt.anvil import Anvil, PAGE_SIZE, EMPTY_PAGE
+
+SAMPLE_REGION=os.path.join('test','data','MC-1_14_4-World','region','r.0.0.mca')
+OUTPUT=os.path.join('test','tmp','bench-write.mca')
+REPEAT=20
+
+def legacy_write_to(region, output):
+    """ Anvil.write_to as it was before the vectored write path
+    """
+    region.load()
+    addr = 2
+    for data in region._data:
+        size = (len(data)+PAGE_SIZE-1)//PAGE_SIZE
+        if size == 0:
+            word = b"\x00\x00\x00\x00"
+        else:
+            word = ((addr<<8) | (size&0xFF)).to_bytes(4, 'big')
+            addr += size
+
+        output.write(word)
+
+    for timestamp in region._timestamp:
+        output.write(timestamp.to_bytes(4, 'big'))
+
+    for data in region._data:
+        output.write(data)
+
+        pad = len(data)%PAGE_SIZE
+        if pad > 0:
+            output.write(EMPTY_PAGE[pad:])
+
+def to_file(write, buffering):
+    def run(region):
+        with open(OUTPUT, 'wb', buffering=buffering) as output:
+            write(region, output)
+    return run
+
+def to_bytesio(write):
+    def run(region):
+        write(region, io.BytesIO())
+    return run
+
+def to_memoryview(region):
+    region.write_to(memoryview(bytearray(region.file_size())))
+
+CASES=(
+  ("unbuffered file", to_file(legacy_write_to, 0), to_file(Anvil.write_to, 0)),
+  ("buffered file", to_file(legacy_write_to, -1), to_file(Anvil.write_to, -1)),
+  ("BytesIO", to_bytesio(legacy_write_to), to_bytesio(Anvil.write_to)),
+  ("memoryview", None, to_memoryview),
+)
+
+def timeit(fct, region):
+    start = perf_counter()
+    for _ in range(REPEAT):
+        fct(region)
+    return (perf_counter() - start)/REPEAT
+
+if __name__ == "__main__":
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        region = Anvil.fromFile(0,0,SAMPLE_REGION)
+
+    size = region.file_size()/2**20
+    print("{:16s} {:>12s} {:>12s}".format("output", "legacy MiB/s", "new MiB/s"))
+    for name, legacy, new in CASES:
+        legacy_speed = size/timeit(legacy, region) if legacy else float('nan')
+        print("{:16s} {:12.1f} {:12.1f}".format(name, legacy_speed, size/timeit(new, region)))
+
+    os.unlink(OUTPUT)
@@ -0,0 +1,155 @@
+""" An asyncio facade over World
+
+    File reads, decompression and NBT parsing are performed in a bounded
+    thread pool so they do not stall the event loop. Concurrent requests
+    for the same region or chunk are coalesced into a single load, and
+    loaded chunks are kept in a shared, size-bounded cache.
+
+    Objects returned by AsyncWorld are shared between callers. They should
+    be considered read-only.
+
+    The region and chunk caches are only updated from the event loop
+    thread. Regions, however, load their chunk data lazily, so the jobs
+    running in the thread pool on the same region (chunk loads, section
+    decoding) are serialized by a per-region lock.
+
+    Cached chunks are never invalidated: after the world files have
+    been modified by another writer, an AsyncWorld may return stale
+    data. Use a new AsyncWorld (or clear its cache) to see the changes.
+"""
+
+import asyncio
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from mynbt.world import World
+from mynbt.region import tree_size
+from mynbt.cache import LRUCache
+
+# ====================================================================
+# AsyncWorld
+# ====================================================================
+class AsyncWorld:
+    """ Asynchronous read access to a world
+
+        `world` is a World instance or a world directory. At most
+        `max_regions` regions are kept open. Loaded chunks are stored in
+        `cache` (an LRUCache that may be shared by several AsyncWorld
+        instances), or in a private cache by default.
+    """
+    def __init__(self, world, *, max_workers=4, max_regions=16, cache=None, executor=None):
+        self._world = world if isinstance(world, World) else World(world)
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+        self._max_regions = max_regions
+        self._regions = OrderedDict()
+        self._locks = {}
+        self._cache = cache if cache is not None else LRUCache()
+        self._pending = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    @property
+    def cache(self):
+        return self._cache
+
+    #------------------------------------
+    # Utilities
+    #------------------------------------
+    async def _run(self, fct, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fct, *args)
+
+    async def _run_locked(self, rx, rz, fct, *args):
+        """ Run fct(*args) in the thread pool, holding the lock of
+            the region (rx, rz)
+        """
+        lock = self._locks.setdefault((rx, rz), threading.Lock())
+        def locked():
+            with lock:
+                return fct(*args)
+
+        return await self._run(locked)
+
+    async def _coalesce(self, key, coro_fct, *args):
+        """ Await the result of coro_fct(*args), sharing the result with all
+            the concurrent calls using the same key
+        """
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fct(*args))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    #------------------------------------
+    # World access
+    #------------------------------------
+    async def region(self, rx, rz):
+        """ Return the region at (rx, rz). Only the region header is read,
+            chunk data are read when the chunks are requested
+        """
+        region = self._regions.get((rx, rz))
+        if region is not None:
+            self._regions.move_to_end((rx, rz))
+            return region
+
+        return await self._coalesce(('region', rx, rz), self._load_region, rx, rz)
+
+    async def _load_region(self, rx, rz):
+        region = await self._run(lambda: self._world.region(rx, rz, lazy=True))
+
+        self._regions[rx, rz] = region
+        while len(self._regions) > self._max_regions:
+            # running jobs keep their reference to the lock of the evicted region
+            key, _ = self._regions.popitem(last=False)
+            self._locks.pop(key, None)
+
+        return region
+
+    async def chunk(self, cx, cz):
+        """ Return the chunk at (cx, cz) in the world coordinate system,
+            with its NBT tree already parsed
+        """
+        key = (self._world._dirname, cx, cz)
+        chunk = self._cache.get(key)
+        if chunk is not None:
+            return chunk
+
+        return await self._coalesce(('chunk', cx, cz), self._load_chunk, key, cx, cz)
+
+    async def _load_chunk(self, key, cx, cz):
+        rx, x = divmod(cx, 32)
+        rz, z = divmod(cz, 32)
+        region = await self.region(rx, rz)
+
+        def load():
+            chunk = region.chunk[x, z]
+            chunk.nbt
+            return chunk
+
+        chunk = await self._run_locked(rx, rz, load)
+        self._cache.put(key, chunk, tree_size(chunk.nbt, chunk.chunk_info))
+
+        return chunk
+
+    async def block(self, x, y, z):
+        """ Get the block at (x,y,z) in the world coordinate system
+        """
+        cx, x = divmod(x, 16)
+        cy, y = divmod(y, 16)
+        cz, z = divmod(z, 16)
+
+        chunk = await self.chunk(cx, cz)
+        # decoding and unpacking the section is CPU bound
+        return await self._run_locked(cx // 32, cz // 32, lambda: chunk.section(cy).block(x, y, z))
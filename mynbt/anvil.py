@@ -8,19 +8,21 @@
 """
 
 from mmap import mmap, PROT_READ
+import os
+import sys
 from time import time
 from struct import unpack
 from array import array
 from warnings import warn
 from collections import namedtuple
-import zlib
-import gzip
+from concurrent.futures import ThreadPoolExecutor
 import io
 import itertools
 
 from mynbt.nbt import parse, EmptyChunkError
 from mynbt.error import *
-from mynbt.utils import hexdump, patch, withsave
+from mynbt.utils import hexdump, patch, withsave, writev_all
+from mynbt.instrument import stage
 
 PAGE_SIZE=4096
 """ Page-size (in bytes) in the region file
@@ -30,6 +32,10 @@ EMPTY_PAGE = bytes(PAGE_SIZE)
 """ An page full of \x00 bytes
 """
 
+NO_ADDR = -1
+""" Address and size of unallocated chunks in the Anvil chunk tables
+"""
+
 ChunkInfo = namedtuple('ChunkInfo', ['addr', 'size', 'timestamp', 'rx', 'rz', 'x', 'z', 'data'])
 def EMPTY_CHUNK(rx, rz, x,z):
     return ChunkInfo(None,None,0,rx,rz,x,z,EMPTY_PAGE[0:0])
@@ -38,19 +44,11 @@ def EMPTY_CHUNK(rx, rz, x,z):
 # XXX Avoid module's global namespace polution by defining the
 #     following constents in their own namespace (or in the Anvil class?)
 #
-NONE=b"\x00" # not found in official MC files
-GLIB=b"\x01"
-ZLIB=b"\x02"
-COMPRESSOR = {
-  NONE: lambda data : data,
-  GLIB: gzip.compress,
-  ZLIB: zlib.compress,
-}
-DECOMPRESSOR = {
-  NONE: lambda data : data,
-  GLIB: gzip.decompress,
-  ZLIB: zlib.decompress,
-}
+from mynbt.codec import NONE, GLIB, ZLIB, LZ4, CODECS, codec
+
+# Kept for compatibility. Use the mynbt.codec registry instead
+COMPRESSOR = { code: (lambda c: lambda data : c.compress(data))(c) for code, c in CODECS.items() }
+DECOMPRESSOR = { code: c.decompress for code, c in CODECS.items() }
 
 # ====================================================================
 # Errors
@@ -78,6 +76,13 @@ class UnknownCompressionError(BadChunkError):
             msg="Unknown compression code {code}".format(code=chunk_info.data[4:5].hex())
         )
 
+class StaleFileError(AnvilError):
+    def __init__(self, region, path, **kwargs):
+        super().__init__(
+            "{path} has changed since {region} was loaded from it. It can't be updated in place",
+            region=region, path=path
+        )
+
 class MissingDataError(BadChunkError):
     def __init__(self, region, chunk_info, **kwargs):
         super().__init__(
@@ -185,13 +190,83 @@ def parse_chunk_header(chunk_data):
       chunk_data[5:]
     )
 
+def decode_header(header):
+    """ Decode the location and timestamp tables of a region file header
+        (at least 2 pages) in bulk.
+
+        Return a (locations, timestamps) pair of `array('I')`
+    """
+    locations = array('I', bytes(header[:PAGE_SIZE]))
+    timestamps = array('I', bytes(header[PAGE_SIZE:2*PAGE_SIZE]))
+    if sys.byteorder == 'little':
+        locations.byteswap()
+        timestamps.byteswap()
+
+    return locations, timestamps
+
+def file_identity(st):
+    """ Identify the content of a file from its `os.stat` result
+    """
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+def encode_header(addr, size, timestamps):
+    """ Encode the location and timestamp tables of a region file
+        from the chunk addresses, sizes (NO_ADDR for unallocated chunks)
+        and timestamps
+    """
+    locations = array('I', ( a<<8|(s&0xFF) if a != NO_ADDR else 0 for a, s in zip(addr, size) ))
+    timestamps = array('I', timestamps)
+    if sys.byteorder == 'little':
+        locations.byteswap()
+        timestamps.byteswap()
+
+    return locations.tobytes() + timestamps.tobytes()
+
+class FileReader:
+    """ Read parts of a file on demand using `pread`
+
+        `key` identifies the file content at the time it was opened. It
+        changes if the file is rewritten.
+    """
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDONLY)
+        self.key = (path, *file_identity(os.fstat(self._fd)))
+
+    def __call__(self, offset, length):
+        return os.pread(self._fd, length, offset)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
+
+def read_header(path):
+    """ Read the location and timestamp tables of a region file.
+
+        Return a (locations, timestamps) pair of 1024-item sequences.
+        Missing header bytes are read as zeros.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(2*PAGE_SIZE).ljust(2*PAGE_SIZE, b"\x00")
+
+    return decode_header(header)
+
 # ====================================================================
 # Anvil
 # ====================================================================
 class Anvil:
-    def __init__(self, rx, rz, data=b"", *, name=None):
+    def __init__(self, rx, rz, data=b"", *, name=None, reader=None, cache=None):
       """ Create a new region from binary data following the MC region format
           descibed in https://minecraft.gamepedia.com/Region_file_format.
+
+          If `reader` is given, `data` only needs to contain the header. Chunk
+          bodies are then loaded on demand by calling `reader(offset, length)`.
+          If `cache` is given too, chunk bodies loaded that way are kept in
+          that `LRUCache` (which may be shared between regions) instead
+          of in the region itself.
       """
       self._name = name or super().__str__()
       self._rx = rx
@@ -199,6 +274,12 @@ class Anvil:
       self._bitmap = None
       self._issues = []
       self._version = 0
+      self._reader = reader
+      self._data_cache = cache if reader is not None else None
+      self._pending = {}
+      self._compress_workers = None
+      self._file_identity = None
+      self._saved_version = self._version
 
       # ensure the region file contains at least the 2-page header
       if len(data) < 2*PAGE_SIZE:
@@ -208,37 +289,63 @@ class Anvil:
       self._pagecount = 2
 
       view = memoryview(data)
-      locations=view[0:PAGE_SIZE].cast('i')
-      timestamps=view[PAGE_SIZE:2*PAGE_SIZE].cast('i')
-
-      self._chunks = [None] * 1024
-
-      for i in range(1024):
-        z, x = divmod(i, 32)
-        location = int.from_bytes(locations[i:][:1], 'big')
-        if location == 0:
-            self._chunks[i] = EMPTY_CHUNK(rx,rz,x,z)
+      locations, timestamps = decode_header(view)
+
+      # Chunk entries are stored as a struct-of-arrays. Unallocated
+      # chunks have their address and size set to NO_ADDR. Chunks whose
+      # data are not loaded yet have their data set to None
+      self._addr = array('i', (location>>8 if location else NO_ADDR for location in locations))
+      self._size = array('i', (location&0xFF if location else NO_ADDR for location in locations))
+      self._timestamp = array('I', (timestamp if location else 0 for location, timestamp in zip(locations, timestamps)))
+      self._data = [EMPTY_PAGE[0:0]] * 1024
+
+      addr, size = self._addr, self._size
+      for i in [i for i, location in enumerate(locations) if location]:
+        self._pagecount = max(self._pagecount, addr[i]+size[i])
+
+        if reader is not None and addr[i] >= 2:
+            # loaded on demand by chunk_info()
+            self._data[i] = None
         else:
-            issues = []
+            self._load_data(i, view[addr[i]*PAGE_SIZE:][:size[i]*PAGE_SIZE])
 
-            timestamp = int.from_bytes(timestamps[i:][:1], 'big')
-            addr, size = location>>8,location&0xFF # Addr and size in 4KiB pages
-            if addr < 2:
-                issues.append(ChunkDataInHeader)
+    def _info(self, idx):
+        """ Return a ChunkInfo view on the chunk entry at idx
+        """
+        z, x = divmod(idx, 32)
+        addr = self._addr[idx]
+        if addr == NO_ADDR:
+            return ChunkInfo(None, None, self._timestamp[idx], self._rx, self._rz, x, z, self._data[idx])
 
-            data = view[addr*PAGE_SIZE:][:size*PAGE_SIZE]
+        return ChunkInfo(addr, self._size[idx], self._timestamp[idx], self._rx, self._rz, x, z, self._data[idx])
 
-            # Deal with missing data
-            missing_data = size*PAGE_SIZE - len(data)
-            if missing_data:
-                issues.append(MissingData)
-                data = bytes(data) + bytes(missing_data)
+    def _store(self, idx, info):
+        """ Store a ChunkInfo in the chunk entry at idx
+        """
+        self._addr[idx] = NO_ADDR if info.addr is None else info.addr
+        self._size[idx] = NO_ADDR if info.size is None else info.size
+        self._timestamp[idx] = info.timestamp
+        self._data[idx] = info.data
+        self._pending.pop(idx, None)
+
+    def _load_data(self, idx, data):
+        """ Set the data of the chunk entry at idx, tracking issues
+            with the chunk location
+        """
+        addr, size = self._addr[idx], self._size[idx]
+        issues = []
+        if addr < 2:
+            issues.append(ChunkDataInHeader)
 
-            self._pagecount = max(self._pagecount, addr+size)
+        # Deal with missing data
+        missing_data = size*PAGE_SIZE - len(data)
+        if missing_data:
+            issues.append(MissingData)
+            data = bytes(data) + bytes(missing_data)
 
-            self._chunks[i] = ci = ChunkInfo(addr, size, timestamp, rx,rz,x, z, data)
-            for issue in issues:
-                self.track(issue(ci))
+        self._data[idx] = data
+        for issue in issues:
+            self.track(issue(self._info(idx)))
 
     def __str__(self):
         return self._name
@@ -284,10 +391,11 @@ class Anvil:
 
         if self._bitmap is None:
             bitmap = [()]*self._pagecount
-            for chunk in self._chunks:
-                if chunk.addr is not None:
-                    for n in range(chunk.addr, chunk.addr+chunk.size):
-                        owners = bitmap[n] = (*bitmap[n], (chunk.x,chunk.z))
+            for idx, (addr, size) in enumerate(zip(self._addr, self._size)):
+                if addr != NO_ADDR:
+                    z, x = divmod(idx, 32)
+                    for n in range(addr, addr+size):
+                        owners = bitmap[n] = (*bitmap[n], (x,z))
                         if len(owners) > 1:
                             duplicate_pages[n] = owners
 
@@ -301,16 +409,114 @@ class Anvil:
 
     def chunk_info(self, x, z):
         idx = chunk_to_index(x,z)
-        return self._chunks[idx]
+        if idx in self._pending:
+            self.compress_pending([idx])
+        elif self._data[idx] is None:
+            if self._data_cache is None:
+                self._load_data(idx, self._read_data(idx))
+            else:
+                return self._info(idx)._replace(data=self._cached_data(idx))
+
+        return self._info(idx)
+
+    def _read_data(self, idx):
+        return self._reader(self._addr[idx]*PAGE_SIZE, self._size[idx]*PAGE_SIZE)
+
+    def _cached_data(self, idx):
+        """ Return the file-backed data of the chunk entry at idx through
+            the chunk data cache
+        """
+        key = (self._reader.key, self._addr[idx], self._size[idx])
+        data = self._data_cache.get(key)
+        if data is None:
+            self._load_data(idx, self._read_data(idx))
+            data, self._data[idx] = self._data[idx], None
+            self._data_cache.put(key, data, len(data))
+
+        return data
+
+    def timestamp(self, x, z):
+        """ Return the timestamp of a chunk without loading its data
+        """
+        return self._timestamp[chunk_to_index(x,z)]
+
+    def present_chunks(self):
+        """ Return the (x,z) position of the chunks allocated in the
+            region, without loading their data
+        """
+        return [ (idx%32, idx//32) for idx, (addr, data) in enumerate(zip(self._addr, self._data))
+                 if addr != NO_ADDR or data or idx in self._pending ]
+
+    def load(self):
+        """ Load the data of all the chunks, so the region no longer
+            depends on its backing file. Deferred compressions are
+            performed too
+        """
+        self.compress_pending()
+        if self._reader is not None:
+            for idx in range(1024):
+                if self._data[idx] is None:
+                    self._data[idx] = self.chunk_info(idx%32, idx//32).data
+
+            self._reader.close()
+            self._reader = None
+            self._data_cache = None
+
+    #------------------------------------
+    # Deferred compression
+    #------------------------------------
+    def defer_compression(self, workers=None):
+        """ Defer the compression of the chunks written by write_chunk()
+            until their data are needed, usually when the region is saved.
+            Deferred compressions are then performed by a pool of `workers`
+            threads (by default, one per CPU).
+
+            The output is identical to the one produced by compressing
+            each chunk when it is written.
+        """
+        self._compress_workers = workers or os.cpu_count() or 1
+
+    def compress_pending(self, indices=None):
+        """ Perform the deferred compression of the chunks at the given
+            indices (all pending chunks by default)
+        """
+        if indices is None:
+            indices = self._pending.keys()
+
+        items = sorted((idx, self._pending[idx]) for idx in indices if idx in self._pending)
+        if not items:
+            return
+
+        def compress(item):
+            idx, (payload, compression, level) = item
+            return codec(compression).compress(payload, level)
+
+        workers = min(self._compress_workers or 1, len(items))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                dumps = list(executor.map(compress, items))
+        else:
+            dumps = list(map(compress, items))
+
+        for (idx, (payload, compression, level)), dump in zip(items, dumps):
+            del self._pending[idx]
+            self._data[idx] = len(dump).to_bytes(4, 'big') + compression + dump
+            self.chunk_compressed(self._info(idx))
+
+    def chunk_compressed(self, chunk_info):
+        """ Called once the deferred compression of a chunk is done
+        """
+        pass
 
     def set_chunk_info(self, info):
         self.invalidate()
         idx = chunk_to_index(info.x,info.z)
-        self._chunks[idx] = info
+        self._store(idx, info)
 
     #------------------------------------
     # Chunk management
     #------------------------------------
+    @stage("anvil.parse_chunk_header", lambda result, self, chunk_info : result[0])
     def parse_chunk_header(self, chunk_info):
         """ Parse the chunk header, returning
             its logical size, suitable decompressor,
@@ -331,7 +537,7 @@ class Anvil:
             self.track(MissingData(chunk_info))
 
         try:
-            return length, DECOMPRESSOR[compression], data[:length]
+            return length, codec(bytes(compression)).decompress, data[:length]
         except KeyError:
             raise UnknownCompressionError(self, chunk_info) from None
 
@@ -367,7 +573,16 @@ class Anvil:
 
       return nbt
 
-    def write_chunk(self, x, z, nbt, *, compression=ZLIB, timestamp=None):
+    @stage("anvil.write_chunk", lambda ci, *args, **kwargs : len(ci.data or b""))
+    def write_chunk(self, x, z, nbt, *, compression=ZLIB, level=None, timestamp=None):
+        """ Serialize and compress an NBT tree as the chunk (x,z)
+
+            `level` is the compression level (codec dependent, e.g.
+            0-9 for zlib). None selects the codec default.
+
+            If compression is deferred (see defer_compression()), the
+            data of the returned chunk info are None.
+        """
         self.invalidate()
 
         assert_in_range(x, 0, 32, 'x')
@@ -375,19 +590,24 @@ class Anvil:
 
         #chunk_info = self.chunk_info(x,z)
 
-        data = io.BytesIO()
-        nbt.write_to(data)
-        dump = data.getbuffer()
-        dump = COMPRESSOR[compression](dump)
-
-        logical_size = len(dump)
-        dump = logical_size.to_bytes(4, 'big') + compression + dump
+        dump = nbt.dump()
 
         size = addr = None
         timestamp = timestamp or int(time())
 
-        idx = z*32+x
-        self._chunks[idx] = ci = ChunkInfo(addr, size, timestamp, self._rx, self._rz, x, z, dump)
+        if self._compress_workers:
+            ci = ChunkInfo(addr, size, timestamp, self._rx, self._rz, x, z, None)
+            self._store(z*32+x, ci)
+            self._pending[z*32+x] = (bytes(dump), compression, level)
+            return ci
+
+        dump = codec(compression).compress(dump, level)
+
+        logical_size = len(dump)
+        dump = logical_size.to_bytes(4, 'big') + compression + dump
+
+        ci = ChunkInfo(addr, size, timestamp, self._rx, self._rz, x, z, dump)
+        self._store(z*32+x, ci)
         return ci
 
     def set_chunk_data(self, x, z, data, timestamp=None):
@@ -418,6 +638,42 @@ class Anvil:
         self.set_chunk_info(chunk_info)
         return chunk_info
 
+    def relocate_chunk(self, x, z, chunk_info, relocate):
+        """ Attach a chunk to a region, adjusting its content in place
+
+            The chunk payload is decompressed to a writable buffer and
+            parsed. `relocate(nbt)` should then patch the position-dependent
+            fields in place (see mynbt.nbt.patch_in_place) and return True,
+            return False if no change was needed, or None if the
+            chunk can't be patched in place.
+
+            Chunks needing no change are stored without being recompressed.
+            Patched chunks are recompressed once, with their original codec,
+            without being serialized again.
+
+            Return the new chunk info, or None if `relocate` failed.
+        """
+        length, decompressor, data = self.parse_chunk_header(chunk_info)
+        if length == 0:
+            return None
+
+        payload = bytearray(decompressor(data))
+        nbt, *_ = parse(payload)
+        changed = relocate(nbt)
+        if changed is None:
+            return None
+
+        if not changed:
+            return Anvil.set_chunk(self, x, z, chunk_info)
+
+        compression = bytes(chunk_info.data[4:5])
+        dump = codec(compression).compress(payload)
+        dump = len(dump).to_bytes(4, 'big') + compression + dump
+
+        info = ChunkInfo(None, None, chunk_info.timestamp, self._rx, self._rz, x, z, dump)
+        self.set_chunk_info(info)
+        return info
+
     def kill_chunk(self, x, z):
         """ Remove a chunk
         """
@@ -447,54 +703,213 @@ class Anvil:
         return self.Chunk(self, self.chunk_info(x, z))
 
     def chunks(self, filter=lambda region, info : len(info.data) and region.is_valid_chunk(info)):
-        for chunk in self._chunks:
+        for idx in range(1024):
+            chunk = self.chunk_info(idx%32, idx//32)
             if filter(self, chunk):
                 yield self.chunk[chunk.x, chunk.z]
 
     #------------------------------------
     # I/O
     #------------------------------------
-    def write_to(self, output, *, filter=lambda x,y:True):
-        """ Write the current region file to the given output
-            Output should support the 'write' operations
+    def _layout(self):
+        """ Return the list of buffers making up the region file, and
+            the total byte size of the file
         """
+        addrs, sizes, pagecount = self._allocate()
 
-        # walk over the chunk list to write the chunk offset and size in the file
-        addr = 2
-        for chunk in self._chunks:
+        buffers = [encode_header(addrs, sizes, self._timestamp)]
+        for data in self._data:
+            if data:
+                buffers.append(data)
+                pad = len(data)%PAGE_SIZE
+                if pad > 0:
+                    buffers.append(EMPTY_PAGE[pad:])
 
-            size = (len(chunk.data)+PAGE_SIZE-1)//PAGE_SIZE
-            if size == 0:
-                word = b"\x00\x00\x00\x00"
-            else:
-                word = ((addr<<8) | (size&0xFF)).to_bytes(4, 'big')
+        return buffers, pagecount*PAGE_SIZE
+
+    def _allocate(self):
+        """ Return the chunk addresses and sizes (in pages) of the region
+            file write_to() would produce, and its page count
+        """
+        self.load()
+
+        # chunks are stored contiguously after the header
+        addrs = array('i', [NO_ADDR])*1024
+        sizes = array('i', [NO_ADDR])*1024
+        addr = 2
+        for idx, data in enumerate(self._data):
+            size = (len(data)+PAGE_SIZE-1)//PAGE_SIZE
+            if size:
+                addrs[idx], sizes[idx] = addr, size
                 addr += size
 
-            output.write(word)
+        return addrs, sizes, addr
+
+    def _saved(self, path):
+        """ Called once the region was fully written to `path`: the
+            region now describes that file, so it can be updated in place
+        """
+        self._addr, self._size, self._pagecount = self._allocate()
+        self._file_identity = file_identity(os.stat(path))
+        self._saved_version = self._version
+        self._bitmap = None
+
+    def file_size(self):
+        """ Return the size in bytes of the region file write_to() would produce
+        """
+        return self._layout()[1]
 
-        # walk over the chunk list to write the timestamps
-        for chunk in self._chunks:
-            output.write(chunk.timestamp.to_bytes(4, 'big'))
+    @stage("anvil.write_to", lambda total, *args, **kwargs : total)
+    def write_to(self, output, *, filter=lambda x,y:True):
+        """ Write the current region file to the given output
 
+            Output should support the 'write' operations, or be a
+            writable buffer (e.g. a memoryview) of at least file_size()
+            bytes. Regular binary files are written using vectored I/O.
 
-        # walk over the chunk list to write the data
-        for chunk in self._chunks:
-            output.write(chunk.data)
+            Return the number of bytes written.
+        """
+        buffers, total = self._layout()
+
+        if isinstance(output, (memoryview, bytearray)):
+            view = memoryview(output).cast('B')
+            if len(view) < total:
+                raise ValueError("The output buffer must be at least {:d} bytes long".format(total))
+
+            offset = 0
+            for buffer in buffers:
+                view[offset:offset+len(buffer)] = buffer
+                offset += len(buffer)
+        elif isinstance(output, (io.BufferedWriter, io.FileIO)) and hasattr(os, 'writev'):
+            # bypass the buffer, then resync its position with the file one
+            output.flush()
+            fd = output.fileno()
+            writev_all(fd, buffers)
+            output.seek(os.lseek(fd, 0, os.SEEK_CUR))
+        else:
+            output.write(b"".join(buffers))
 
-            pad = len(chunk.data)%PAGE_SIZE
-            if pad > 0:
-                output.write(EMPTY_PAGE[pad:])
+        return total
+
+    def save_in_place(self, path=None):
+        """ Update the region file the region was loaded from, writing only
+            the new and modified chunks
+
+            Chunk data are written first, only to pages not used by the chunks
+            referenced by the current file header. Once they are flushed to
+            the device, the header is overwritten. So, if the update is
+            interrupted, the file still holds the previous version of the
+            region (assuming the 8KiB header write is not torn).
+
+            Freed pages are not reclaimed: the file may grow. A full
+            save() compacts the file.
+
+            Raise StaleFileError if the file has changed since the region
+            was loaded or last saved.
+        """
+        path = path or self.filepath
+        self.compress_pending()
+
+        fd = os.open(path, os.O_RDWR)
+        try:
+            st = os.fstat(fd)
+            if self._file_identity is None or file_identity(st) != self._file_identity:
+                raise StaleFileError(self, path)
+
+            # Pages that can't be overwritten
+            used = set(range(2))
+            locations, _ = decode_header(os.pread(fd, 2*PAGE_SIZE, 0).ljust(2*PAGE_SIZE, b"\x00"))
+            for addr, size in itertools.chain(
+                  ((location>>8, location&0xFF) for location in locations if location),
+                  ((addr, size) for addr, size in zip(self._addr, self._size) if addr != NO_ADDR)
+                ):
+                used.update(range(addr, addr+size))
+
+            end = max(max(used)+1, (st.st_size+PAGE_SIZE-1)//PAGE_SIZE)
+
+            def allocate(size):
+                nonlocal end
+                addr = 2
+                while addr+size <= end:
+                    busy = [ n for n in range(addr, addr+size) if n in used ]
+                    if not busy:
+                        break
+                    addr = busy[-1]+1
+                else:
+                    addr = end
+
+                used.update(range(addr, addr+size))
+                end = max(end, addr+size)
+                return addr
+
+            writes = []
+            for idx, (addr, data) in enumerate(zip(self._addr, self._data)):
+                if addr == NO_ADDR and data:
+                    size = (len(data)+PAGE_SIZE-1)//PAGE_SIZE
+                    writes.append((idx, allocate(size), size, data))
+
+            for idx, addr, size, data in writes:
+                os.pwrite(fd, bytes(data).ljust(size*PAGE_SIZE, b"\x00"), addr*PAGE_SIZE)
+            os.fsync(fd)
+
+            for idx, addr, size, data in writes:
+                self._addr[idx] = addr
+                self._size[idx] = size
+                self._pagecount = max(self._pagecount, addr+size)
+
+            os.pwrite(fd, encode_header(self._addr, self._size, self._timestamp), 0)
+            os.fsync(fd)
+
+            self._file_identity = file_identity(os.fstat(fd))
+            self._saved_version = self._version
+            self._bitmap = None
+        finally:
+            os.close(fd)
 
     @classmethod
-    def fromFile(cls, rx, rz, path, *, factory=None):
+    def fromFile(cls, rx, rz, path, *, factory=None, lazy=False, cache=None):
+      """ Open a region file
+
+          If `lazy` is set, only the header is read and chunk data are read
+          from the file on first access (see open_header())
+      """
+      if lazy:
+        return cls.open_header(rx, rz, path, factory=factory, cache=cache)
+
       with open(path, 'rb') as f:
         map = f.read() # read into memory since we have issues when
                        # mmap'd backing files are modified
                        # (e.g: by another process of simply by using `save()`)
+        identity = file_identity(os.fstat(f.fileno()))
 
       result = (factory or cls)(rx, rz, map, name=path)
-      old_version = result._version
-      patch(result, withsave(path, open, lambda: result._version > old_version))
+      result._file_identity = identity
+      patch(result, withsave(path, open, lambda: result._version > result._saved_version,
+                                         saved=lambda: result._saved(path)))
+
+      return result
+
+    @classmethod
+    def open_header(cls, rx, rz, path, *, factory=None, cache=None):
+      """ Open a region file reading only its header
+
+          Chunk bodies are read from the file on demand, so this is
+          much faster than fromFile() when only a few chunks, or only
+          the header data, are needed. The file must not be modified by
+          a third party while the region is in use.
+
+          If `cache` is an `LRUCache`, the chunk bodies read from the file
+          are stored there, so memory usage stays bounded when the
+          cache is shared by many regions.
+      """
+      with open(path, 'rb') as f:
+        header = f.read(2*PAGE_SIZE)
+
+      reader = FileReader(path)
+      result = (factory or cls)(rx, rz, header, name=path, reader=reader, cache=cache)
+      result._file_identity = reader.key[1:]
+      patch(result, withsave(path, open, lambda: result._version > result._saved_version, result.load,
+                                         lambda: result._saved(path)))
 
       return result
 
@@ -527,9 +942,14 @@ class Anvil:
             return self
 
         def __exit__(self, exc_type, *args):
-            if exc_type is None and self._nbt and self._nbt._version > self._orig_version:
+            if exc_type is None and self.modified():
                 self.write(self._nbt)
 
+        def modified(self):
+            """ Return True if the chunk NBT tree was changed since it was loaded
+            """
+            return bool(self._nbt) and self._nbt._version > self._orig_version
+
         @property
         def nbt(self):
             """ Lazy loading on the NBT tree
@@ -1,5 +1,7 @@
 from array import array
 
+from mynbt.instrument import stage
+
 """ Bit fields manipulation
 """
 
@@ -38,6 +40,10 @@ INT_FORMAT = 'X' + INT_8*8 + INT_16 *8 + INT_32*16 + INT_64*32
 # ====================================================================
 # Global functions
 # ====================================================================
+def _array_size(result, *args, **kwargs):
+    return len(result)*result.itemsize
+
+@stage("bitpack.unpack", _array_size)
 def unpack(nbits, size, data, dest=None):
     """ split data in nbits chunks
 
@@ -68,6 +74,7 @@ def unpack(nbits, size, data, dest=None):
 
     return dest
 
+@stage("bitpack.pack", _array_size)
 def pack(nbits, size, data):
     """ join data in chunks of nbits
     """
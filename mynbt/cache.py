@@ -0,0 +1,114 @@
+""" Size-bounded caches
+"""
+
+from collections import OrderedDict, namedtuple
+
+# ====================================================================
+# Structs
+# ====================================================================
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'invalidations', 'count', 'size', 'max_size'])
+
+# ====================================================================
+# LRU cache
+# ====================================================================
+class LRUCache:
+    """ A mapping evicting its least recently used items once the total
+        size of the stored items exceeds `max_size`.
+
+        The size of an item is given by the caller when storing it. It is
+        an arbitrary weight (usually a byte count).
+    """
+    def __init__(self, max_size=64*1024*1024):
+        self._items = OrderedDict()
+        self._size = 0
+        self._max_size = max_size
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    #------------------------------------
+    # Properties
+    #------------------------------------
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @property
+    def stats(self):
+        return CacheStats(self._hits, self._misses, self._evictions, self._invalidations,
+                          len(self._items), self._size, self._max_size)
+
+    #------------------------------------
+    # Cache access
+    #------------------------------------
+    def get(self, key, default=None):
+        """ Return the value stored for key, marking it as recently used
+        """
+        try:
+            value, size = self._items[key]
+        except KeyError:
+            self._misses += 1
+            return default
+
+        self._items.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        """ Return the value stored for key without updating
+            the recently used order nor the statistics
+        """
+        try:
+            return self._items[key][0]
+        except KeyError:
+            return default
+
+    def put(self, key, value, size=1):
+        """ Store value for key, evicting older items as required
+        """
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._size -= old[1]
+
+        self._items[key] = (value, size)
+        self._size += size
+
+        # the newly inserted item is never evicted
+        while self._size > self._max_size and len(self._items) > 1:
+            _, (_, old_size) = self._items.popitem(last=False)
+            self._size -= old_size
+            self._evictions += 1
+
+    def discard(self, key):
+        """ Remove key from the cache. Stale entries should be discarded
+            that way so they are reported as invalidations in the statistics
+        """
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._size -= old[1]
+            self._invalidations += 1
+
+    def discard_if(self, predicate):
+        """ Remove all the entries whose key match the predicate
+        """
+        for key in [key for key in self._items if predicate(key)]:
+            self.discard(key)
+
+    def clear(self):
+        """ Remove all the entries. They are reported as invalidations
+            in the statistics
+        """
+        self._invalidations += len(self._items)
+        self._items.clear()
+        self._size = 0
@@ -0,0 +1,187 @@
+""" Compression codecs used for chunk data in region files
+
+    Codecs are identified by the 1-byte compression code stored in
+    the chunk header. Additional codecs can be registered with `register()`.
+
+    https://minecraft.wiki/w/Region_file_format#Chunk_data
+"""
+
+import zlib
+from collections import namedtuple
+from struct import Struct
+
+from mynbt.error import MyNBTError
+from mynbt.instrument import stage
+
+try:
+    import lz4.block as lz4_block
+except ImportError:
+    lz4_block = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# ====================================================================
+# Constants
+# ====================================================================
+NONE=b"\x00" # not found in official MC files
+GLIB=b"\x01"
+ZLIB=b"\x02"
+LZ4=b"\x04"
+
+# ====================================================================
+# Errors
+# ====================================================================
+class CodecError(MyNBTError):
+    """ Base class for all errors issued by the codecs
+    """
+    pass
+
+class UnavailableCodecError(CodecError):
+    def __init__(self, name, operation, module, **kwargs):
+        super().__init__(
+            "The {name} codec requires {module} to {operation} data",
+            name=name, operation=operation, module=module
+        )
+
+class LZ4BlockError(CodecError):
+    def __init__(self, msg, **kwargs):
+        super().__init__("Invalid LZ4 block stream: {msg}", msg=msg)
+
+# ====================================================================
+# Registry
+# ====================================================================
+Codec = namedtuple('Codec', ['code', 'name', 'compress', 'decompress', 'default_level'])
+""" A compression codec
+
+    `compress(data, level)` and `decompress(data)` accept any bytes-like
+    object. `level` may be None to use the codec default.
+"""
+
+CODECS = {}
+
+def register(code, name, compress, decompress, default_level=None):
+    """ Register a codec for the given 1-byte compression code
+
+        Calls to `compress` and `decompress` are recorded as the
+        "<name>.compress" and "<name>.decompress" instrumentation stages,
+        both counting the uncompressed bytes
+    """
+    compress = stage(name + ".compress", lambda result, data, level=None : len(data))(compress)
+    decompress = stage(name + ".decompress", lambda result, data : len(result))(decompress)
+
+    CODECS[code] = codec = Codec(code, name, compress, decompress, default_level)
+    return codec
+
+def codec(code):
+    """ Return the codec registered for a compression code.
+        Raise KeyError for unknown codes
+    """
+    return CODECS[code]
+
+#------------------------------------
+# zlib & gzip
+#------------------------------------
+def _deflate(wbits, default_level):
+    def compress(data, level=None):
+        compressor = zlib.compressobj(default_level if level is None else level, zlib.DEFLATED, wbits)
+        return compressor.compress(data) + compressor.flush()
+
+    return compress
+
+def _inflate(wbits):
+    def decompress(data):
+        # Streaming decompression works directly on (possibly large) memoryviews
+        # and ignores any padding past the end of the compressed stream
+        decompressor = zlib.decompressobj(wbits)
+        result = decompressor.decompress(data)
+        if not decompressor.eof:
+            # like zlib.decompress, don't return partial data
+            raise zlib.error("Error -5 while decompressing data: incomplete or truncated stream")
+
+        return result
+
+    return decompress
+
+register(NONE, "none", lambda data, level=None : bytes(data), bytes)
+register(GLIB, "gzip", _deflate(16+zlib.MAX_WBITS, 9), _inflate(16+zlib.MAX_WBITS), 9)
+register(ZLIB, "zlib", _deflate(zlib.MAX_WBITS, -1), _inflate(zlib.MAX_WBITS), -1)
+
+#------------------------------------
+# LZ4
+#------------------------------------
+# Chunk data are stored using the lz4-java block stream format: a sequence
+# of blocks prefixed by the LZ4BLOCK_MAGIC, a token and three little-endian
+# int32 (compressed length, decompressed length, checksum), ending with an
+# empty block.
+LZ4BLOCK_MAGIC=b"LZ4Block"
+LZ4BLOCK_HEADER=Struct("<8sBiii")
+LZ4BLOCK_RAW=0x10
+LZ4BLOCK_LZ4=0x20
+LZ4BLOCK_SEED=0x9747b28c
+LZ4BLOCK_SIZE=1<<16
+
+def _lz4_checksum(data):
+    return xxhash.xxh32_intdigest(data, LZ4BLOCK_SEED) & 0x0FFFFFFF
+
+def lz4_compress(data, level=None):
+    """ Compress data using the lz4-java block stream format
+    """
+    if lz4_block is None or xxhash is None:
+        raise UnavailableCodecError("LZ4", "compress", "the lz4 and xxhash modules")
+
+    # the compression level token is log2(block size) - 10
+    token_level = LZ4BLOCK_SIZE.bit_length()-1-10
+    mode = 'default' if not level else 'high_compression'
+
+    result = bytearray()
+    view = memoryview(data)
+    for offset in range(0, len(view), LZ4BLOCK_SIZE):
+        block = view[offset:offset+LZ4BLOCK_SIZE]
+        compressed = lz4_block.compress(block, mode=mode, compression=level or 0, store_size=False)
+        method = LZ4BLOCK_LZ4
+        if len(compressed) >= len(block):
+            compressed, method = block, LZ4BLOCK_RAW
+
+        result += LZ4BLOCK_HEADER.pack(LZ4BLOCK_MAGIC, method|token_level,
+                                       len(compressed), len(block), _lz4_checksum(block))
+        result += compressed
+
+    result += LZ4BLOCK_HEADER.pack(LZ4BLOCK_MAGIC, LZ4BLOCK_RAW|token_level, 0, 0, 0)
+    return bytes(result)
+
+def lz4_decompress(data):
+    """ Decompress data stored in the lz4-java block stream format
+
+        Checksums are not verified. Raw (uncompressed) blocks can be
+        decoded without the lz4 module.
+    """
+    result = bytearray()
+    view = memoryview(data)
+    offset = 0
+    while True:
+        if len(view) - offset < LZ4BLOCK_HEADER.size:
+            raise LZ4BlockError("truncated block header at offset {:d}".format(offset))
+
+        magic, token, length, decompressed_length, checksum = LZ4BLOCK_HEADER.unpack_from(view, offset)
+        if magic != LZ4BLOCK_MAGIC:
+            raise LZ4BlockError("bad magic at offset {:d}".format(offset))
+
+        offset += LZ4BLOCK_HEADER.size
+        if decompressed_length == 0:
+            return bytes(result)
+
+        block = view[offset:offset+length]
+        offset += length
+        if token & 0xF0 == LZ4BLOCK_RAW:
+            result += block
+        elif token & 0xF0 == LZ4BLOCK_LZ4:
+            if lz4_block is None:
+                raise UnavailableCodecError("LZ4", "decompress", "the lz4 module")
+            result += lz4_block.decompress(block, uncompressed_size=decompressed_length)
+        else:
+            raise LZ4BlockError("unknown method {:#x}".format(token & 0xF0))
+
+register(LZ4, "lz4", lz4_compress, lz4_decompress)
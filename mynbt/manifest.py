@@ -0,0 +1,240 @@
+""" A persistent index of the chunks stored in a world
+
+    The manifest is a small SQLite database stored in the world directory.
+    It is built by reading the header of each region file (plus the 5-byte
+    header of each chunk to get its compressed size), so it is cheap to
+    build and cheap to refresh: a region is only rescanned when its file
+    modification time or size has changed.
+
+    Optionally, an `extract` function can be given to record arbitrary
+    (key, value) pairs for each chunk (e.g. the ids of the tile entities it
+    contains). Extraction requires parsing the chunks, so it is performed
+    only on the regions that are rescanned.
+"""
+
+import os
+import os.path
+import sqlite3
+
+from mynbt.anvil import PAGE_SIZE, read_header
+
+# ====================================================================
+# Constants
+# ====================================================================
+SCHEMA_VERSION=1
+
+SCHEMA="""
+CREATE TABLE IF NOT EXISTS regions (
+    rx INTEGER, rz INTEGER,
+    mtime INTEGER, size INTEGER,
+    bitmap BLOB,
+    PRIMARY KEY (rx, rz)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    rx INTEGER, rz INTEGER, x INTEGER, z INTEGER,
+    cx INTEGER, cz INTEGER,
+    addr INTEGER, sectors INTEGER, timestamp INTEGER,
+    length INTEGER, compression INTEGER,
+    PRIMARY KEY (cx, cz)
+);
+CREATE INDEX IF NOT EXISTS chunks_by_region ON chunks (rx, rz);
+CREATE TABLE IF NOT EXISTS keys (
+    cx INTEGER, cz INTEGER,
+    key TEXT, value,
+    rx INTEGER, rz INTEGER
+);
+CREATE INDEX IF NOT EXISTS keys_by_key ON keys (key, value);
+CREATE INDEX IF NOT EXISTS keys_by_region ON keys (rx, rz);
+"""
+
+# ====================================================================
+# Utilities
+# ====================================================================
+def scan_region_file(path):
+    """ Yield the (x, z, addr, sectors, timestamp, length, compression) tuple
+        of each chunk present in a region file.
+
+        Only the file header and the first 5 bytes of each chunk are read.
+        Chunks whose header is invalid are reported with a length and
+        compression set to None.
+    """
+    locations, timestamps = read_header(path)
+    file_size = os.path.getsize(path)
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        for idx, (location, timestamp) in enumerate(zip(locations, timestamps)):
+            addr, sectors = location >> 8, location & 0xFF
+            if addr < 2 or sectors == 0:
+                continue
+
+            z, x = divmod(idx, 32)
+            length = compression = None
+            header = os.pread(fd, 5, addr*PAGE_SIZE) if addr*PAGE_SIZE < file_size else b""
+            if len(header) == 5:
+                length = int.from_bytes(header[:4], 'big')
+                compression = header[4]
+
+            yield (x, z, addr, sectors, timestamp, length, compression)
+    finally:
+        os.close(fd)
+
+def chunk_bitmap(chunks):
+    """ Return the 128-byte presence bitmap of a region given the (x,z)
+        position of its chunks. Bit 32*z+x is set for present chunks
+    """
+    bitmap = bytearray(128)
+    for x, z in chunks:
+        idx = 32*z+x
+        bitmap[idx >> 3] |= 1 << (idx & 7)
+
+    return bytes(bitmap)
+
+def _range_clause(column, r):
+    if r is None:
+        return "1", ()
+
+    return "{c} >= ? AND {c} < ?".format(c=column), (r.start, r.stop)
+
+# ====================================================================
+# Manifest
+# ====================================================================
+class Manifest:
+    """ The chunk manifest of a world
+
+        `path` is the location of the SQLite database. `extract`, if given,
+        is called with each chunk of the rescanned regions and should return
+        an iterable of (key, value) pairs to record for that chunk.
+    """
+    def __init__(self, world, path, *, extract=None):
+        self._world = world
+        self._path = path
+        self._extract = extract
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+        self._db.execute("PRAGMA user_version = {:d}".format(SCHEMA_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    #------------------------------------
+    # Maintenance
+    #------------------------------------
+    def refresh(self, *, force=False):
+        """ Bring the manifest up to date with the region files
+
+            Only the regions whose modification time or size changed since
+            the last refresh are rescanned, unless `force` is set. Entries
+            for region files that no longer exist are removed.
+
+            Return the list of the (rx, rz) positions of the rescanned regions
+        """
+        db = self._db
+        known = { (rx, rz): (mtime, size) for rx, rz, mtime, size in db.execute(
+            "SELECT rx, rz, mtime, size FROM regions"
+        )}
+
+        rescanned = []
+        with db:
+            for rx, rz in self._world.region_coords():
+                path = self._world._locator.region(rx, rz)
+                st = os.stat(path)
+                stamp = (st.st_mtime_ns, st.st_size)
+                if not force and known.pop((rx, rz), None) == stamp:
+                    continue
+
+                known.pop((rx, rz), None)
+                self._scan(rx, rz, path, stamp)
+                rescanned.append((rx, rz))
+
+            for rx, rz in known:
+                self._forget(rx, rz)
+
+        return rescanned
+
+    def _forget(self, rx, rz):
+        for table in ("regions", "chunks", "keys"):
+            self._db.execute("DELETE FROM {} WHERE rx = ? AND rz = ?".format(table), (rx, rz))
+
+    def _scan(self, rx, rz, path, stamp):
+        self._forget(rx, rz)
+
+        rows = [ (rx, rz, x, z, rx*32+x, rz*32+z) + tuple(info)
+                 for x, z, *info in scan_region_file(path) ]
+        self._db.executemany(
+            "INSERT INTO chunks VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows
+        )
+        self._db.execute(
+            "INSERT INTO regions VALUES (?,?,?,?,?)",
+            (rx, rz) + stamp + (chunk_bitmap((row[2], row[3]) for row in rows),)
+        )
+
+        if self._extract is not None and rows:
+            region = self._world.region(rx, rz)
+            self._db.executemany(
+                "INSERT INTO keys VALUES (?,?,?,?,?,?)",
+                ( (rx*32+chunk.x, rz*32+chunk.z, key, value, rx, rz)
+                  for chunk in region.chunks()
+                  for key, value in self._extract(chunk) )
+            )
+
+    #------------------------------------
+    # Queries
+    #------------------------------------
+    def regions(self, cx_range=None, cz_range=None):
+        """ Return the sorted list of (rx, rz) positions of the regions
+            holding at least one chunk in the given chunk ranges
+        """
+        x_clause, x_args = _range_clause("cx", cx_range)
+        z_clause, z_args = _range_clause("cz", cz_range)
+        return [ tuple(row) for row in self._db.execute(
+            "SELECT DISTINCT rx, rz FROM chunks WHERE {} AND {} ORDER BY rx, rz".format(x_clause, z_clause),
+            x_args + z_args
+        )]
+
+    def chunks(self, cx_range=None, cz_range=None):
+        """ Return the list of (cx, cz) positions of the chunks present
+            in the given chunk ranges, grouped by region
+        """
+        x_clause, x_args = _range_clause("cx", cx_range)
+        z_clause, z_args = _range_clause("cz", cz_range)
+        return [ tuple(row) for row in self._db.execute(
+            "SELECT cx, cz FROM chunks WHERE {} AND {} ORDER BY rx, rz, cz, cx".format(x_clause, z_clause),
+            x_args + z_args
+        )]
+
+    def chunk(self, cx, cz):
+        """ Return a dictionary describing the chunk at (cx, cz) or None
+            if that chunk is not present
+        """
+        cursor = self._db.execute("SELECT * FROM chunks WHERE cx = ? AND cz = ?", (cx, cz))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        return dict(zip((column[0] for column in cursor.description), row))
+
+    def bitmap(self, rx, rz):
+        """ Return the 128-byte chunk presence bitmap of a region. Bit 32*z+x
+            is set for chunks present in the region file
+        """
+        row = self._db.execute("SELECT bitmap FROM regions WHERE rx = ? AND rz = ?", (rx, rz)).fetchone()
+        return row[0] if row else bytes(128)
+
+    def find(self, key, value=None):
+        """ Return the sorted list of (cx, cz) positions of the chunks for
+            which the extract function reported `key` (with the given
+            `value` if not None)
+        """
+        if value is None:
+            cursor = self._db.execute("SELECT DISTINCT cx, cz FROM keys WHERE key = ? ORDER BY cx, cz", (key,))
+        else:
+            cursor = self._db.execute("SELECT DISTINCT cx, cz FROM keys WHERE key = ? AND value = ? ORDER BY cx, cz", (key, value))
+
+        return [ tuple(row) for row in cursor ]
@@ -1,5 +1,6 @@
 import gzip
 import struct
+import sys
 from weakref import WeakSet
 import collections
 from collections.abc import Hashable, MutableSequence
@@ -10,6 +11,7 @@ import io
 from mynbt.visitor import Visitor, Exporter
 from mynbt.error import *
 from mynbt.utils import patch,withsave
+from mynbt.instrument import stage
 import mynbt.bitpack as bitpack
 
 # ====================================================================
@@ -26,16 +28,23 @@ class CircularReferenceError(NBTError):
     def __init__(self):
         super().__init__("Circular reference detected")
 
+# ====================================================================
+# Binary formats
+# ====================================================================
+SHORT=struct.Struct(">h")
+INT=struct.Struct(">i")
+TAG_HEADER=struct.Struct(">Bh") # tag id + name length
+LIST_HEADER=struct.Struct(">Bi") # item id + item count
+
 # ====================================================================
 # Module functions
 # ====================================================================
 def parse_id(base, offset):
-    ID, = struct.unpack('>B',bytes(base[offset:offset+1]))
-    return ID,offset+1
+    return base[offset],offset+1
 
 def parse_name(base, offset):
-    l, = struct.unpack('>h',bytes(base[offset:offset+2]))
-    name = bytes(base[offset+2:offset+2+l]).decode("utf8")
+    l, = SHORT.unpack_from(base,offset)
+    name = str(base[offset+2:offset+2+l], "utf8")
     return name,offset+2+l
 
 def parse_tag(base, offset):
@@ -45,19 +54,72 @@ def parse_tag(base, offset):
 
     return trait, offset
 
+def parse_header(base, offset):
+    """ Decode the id and name of the tag at base[offset]. This is
+        parse_tag() followed by parse_name(), using a single unpack.
+
+        Return the tag trait, its name (None for End tags), and the
+        offset of the tag payload
+    """
+    ID = base[offset]
+    if ID == 0:
+      return EndTrait, None, offset+1
+
+    ID, l = TAG_HEADER.unpack_from(base, offset)
+    offset += 3
+    return TraitMetaclass.TRAITS[ID], str(base[offset:offset+l], "utf8"), offset+l
+
+@stage("nbt.parse", lambda result, base, offset=0, parent=None : result[2]-offset)
 def parse(base, offset=0, parent=None):
+    return _parse(base, offset, parent)
+
+def _parse(base, offset=0, parent=None):
     base = memoryview(base)
     start = offset
-    name = None
-    trait, offset = parse_tag(base,offset)
+    trait, name, offset = parse_header(base,offset)
     if trait is EndTrait:
       result = End(parent=parent)
     else:
-      name, offset = parse_name(base, offset)
       result, offset = trait.make_from_payload(base, offset, parent=parent)
+      if parent is None:
+        # keep the whole source span of root nodes to write them back
+        # with a single write while unmodified
+        result._source = (name, base[start:offset])
 
     return result, name, offset
 
+def patch_in_place(container, key, fct, index=None):
+    """ Replace the value v of the atom container[key] (or of the item
+        `index` of the array container[key]) by fct(v), writing directly in
+        the binary payload the node was parsed from.
+
+        The tree is not invalidated: the payloads of the enclosing nodes
+        share the same buffer, so they are updated too. This is only
+        possible for nodes still in their parsed (proxy) form, backed
+        by a writable buffer (i.e. parsed from a bytearray).
+
+        Return True on success, False if the node can't be patched in place
+    """
+    node = container._get(key)
+    if not isinstance(node, (AtomProxy, ArrayProxy)) or node._payload.readonly:
+        return False
+
+    trait = node._trait
+    if isinstance(node, ArrayProxy):
+        offset = 4+index*trait.SIZE if index is not None else -1
+        if not 4 <= offset <= len(node._payload)-trait.SIZE:
+            return False
+    elif index is None:
+        offset = 0
+    else:
+        return False
+
+    value, = trait.STRUCT.unpack_from(node._payload, offset)
+    trait.STRUCT.pack_into(node._payload, offset, fct(value))
+    node._value = None
+
+    return True
+
 def parse_file(path):
     readers = (
       gzip.open,
@@ -82,8 +144,12 @@ def parse_file(path):
     # monkey patch the root object to add a save() method
     # In addition, the object behaves as a context manager
     # to save the file on exit
-    old_version = result._version
-    patch(result, withsave(path, reader, lambda : result._version > old_version))
+    saved_version = result._version
+    def saved():
+      nonlocal saved_version
+      saved_version = result._version
+
+    patch(result, withsave(path, reader, lambda : result._version > saved_version, saved=saved))
 
     return result
 
@@ -98,6 +164,8 @@ class Node:
         When the value of a proxy node is accessed, it instanciates
         a value node
     """
+    _source = None # (name, span) of root nodes. See parse()
+
     def __init__(self, *, trait, payload=None, parent = None):
         self._version = 0
         self._trait = trait
@@ -271,6 +339,11 @@ class Node:
             The output is assumed to be a binary stream
         """
         # XXX rename me to write_into or write_to or dump_to
+        source = self._source_span(name)
+        if source is not None:
+            output.write(source)
+            return
+
         output.write(self._trait.ID.to_bytes(1, 'big'))
         if name is not None:
             output.write(len(name).to_bytes(2, 'big'))
@@ -281,7 +354,24 @@ class Node:
         else:
             self.write_payload(output)
 
+    def _source_span(self, name):
+        """ Return the slice of the source buffer holding the tag, name and
+            payload of this node if it can be written back as is
+        """
+        if self._source is None or self._payload is None:
+            return None
+
+        source_name, span = self._source
+        return span if source_name == name else None
+
     def dump(self, name=""):
+        """ Return the binary representation of the node. Unmodified
+            parsed trees are returned as a slice of their source buffer
+        """
+        source = self._source_span(name)
+        if source is not None:
+            return source
+
         output = io.BytesIO()
         self.write_to(output, name)
         return output.getbuffer()
@@ -321,7 +411,7 @@ class Value(Node):
             This implementation assume `self` is
             a subclass of a native Python type
         """
-        return struct.pack(self._trait.FORMAT, self)
+        return self._trait.STRUCT.pack(self)
 
 class Integer(int, Value):
     def __new__(cls, value, **kwargs):
@@ -489,20 +579,19 @@ class Array(Value):
         view = memoryview(data).cast(bitpack.UINT_8).cast(typecode)
         SEGSIZE=min(1024, count) # actually SEGSIZE is the sive in items, not bytes
         buffer=bytearray(SEGSIZE*size)
-        fmt = ">" + typecode*SEGSIZE
+        segment = struct.Struct(">" + typecode*SEGSIZE)
         while len(view) > SEGSIZE:
             head = view[:SEGSIZE]
             view = view[SEGSIZE:]
 
-            struct.pack_into(fmt, buffer, 0, *head)
+            segment.pack_into(buffer, 0, *head)
             output.write(buffer)
 
         remaining = len(view)
 
         if remaining:
-            fmt = fmt[:remaining+1]
             buffer = memoryview(buffer)[:remaining*size]
-            struct.pack_into(fmt, buffer, 0, *view)
+            struct.pack_into(">" + typecode*remaining, buffer, 0, *view)
             output.write(buffer)
 
     #------------------------------------
@@ -596,11 +685,11 @@ class Proxy(Node):
 
 class AtomProxy(Proxy):
     def unpack(self):
-        return struct.unpack(self._trait.FORMAT, self._payload)[0]
+        return self._trait.STRUCT.unpack(self._payload)[0]
 
 class ArrayProxy(Proxy):
     def unpack(self):
-        return (v for v, in struct.iter_unpack(self._trait.FORMAT, self._payload[4:]))
+        return (v for v, in self._trait.STRUCT.iter_unpack(self._payload[4:]))
 
     #------------------------------------
     # Node interface
@@ -613,7 +702,7 @@ class ArrayProxy(Proxy):
 
 class StringProxy(Proxy):
     def unpack(self):
-        return bytes(self._payload[2:]).decode("utf8") # XXX unneeded (?) copy
+        return str(self._payload[2:], "utf8")
 
 # ====================================================================
 # Composites
@@ -916,18 +1005,18 @@ class Reader:
 
 class AtomReader(Reader):
     def make_from_payload(self, base, offset, *, parent):
-        payload = base[offset:offset+self._trait.SIZE]
-        return AtomProxy(trait=self._trait, payload=payload, parent=parent),offset+self._trait.SIZE
+        end = offset+self._trait.SIZE
+        return AtomProxy(trait=self._trait, payload=base[offset:end], parent=parent),end
 
 class ArrayReader(Reader):
     def make_from_payload(self, base, offset, *, parent):
-        l, = struct.unpack('>i',bytes(base[offset:offset+4]))
-        payload = base[offset:offset+4+l*self._trait.SIZE]
-        return ArrayProxy(trait=self._trait, payload=payload, parent=parent),offset+4+l*self._trait.SIZE
+        l, = INT.unpack_from(base,offset)
+        end = offset+4+l*self._trait.SIZE
+        return ArrayProxy(trait=self._trait, payload=base[offset:end], parent=parent),end
 
 class StringReader(Reader):
     def make_from_payload(self, base, offset, *, parent):
-        l, = struct.unpack('>h',bytes(base[offset:offset+2]))
+        l, = SHORT.unpack_from(base,offset)
         payload = base[offset:offset+2+l]
         return StringProxy(trait=self._trait, payload=payload, parent=parent),offset+2+l
 
@@ -936,7 +1025,7 @@ class ListReader(Reader):
         start = offset
 
         child_trait, offset = parse_tag(base, offset)
-        count, = struct.unpack('>i',bytes(base[offset:offset+4]))
+        count, = INT.unpack_from(base,offset)
         offset += 4
         # XXX Check implications of that statement:
         # """ If the length of the list is 0 or negative,
@@ -965,7 +1054,7 @@ class CompoundReader(Reader):
         start = offset
         items = {}
         while True:
-          item, name, offset = parse(base, offset, parent=container)
+          item, name, offset = _parse(base, offset, parent=container)
           if type(item) is End:
             break
           dict.__setitem__(container, name, item) # direct access to the storage to bypass invalidate()
@@ -984,6 +1073,11 @@ class TraitMetaclass(type):
     def __new__(meta, cls, bases, dct):
         cls = super().__new__(meta, cls, bases, dct)
 
+        # precompile FORMAT
+        FORMAT = dct.get('FORMAT')
+        if FORMAT is not None:
+          cls.STRUCT = struct.Struct(FORMAT)
+
         # tune READER
         READER = getattr(cls, 'READER', None)
         if READER is not None:
@@ -1118,3 +1212,308 @@ TYPE_TO_TRAIT = {
     bool:   ByteTrait,
 }
 
+
+# ====================================================================
+# Native codec
+# ====================================================================
+# Decode NBT data straight to plain Python objects (dict, list, int,
+# float, str and array), without building the node tree. The NBT types
+# erased by that conversion are described by a _schema_ mirroring the
+# data: dicts for compounds, traits for the other tags, and for lists,
+# either a one-item list giving the schema of all the list items or, when
+# the items do not share the same types, a list with one schema per item.
+_SWAP = sys.byteorder == 'little'
+
+def _native_atom(trait):
+    unpack_from = trait.STRUCT.unpack_from
+    size = trait.SIZE
+
+    def read(base, offset):
+        return unpack_from(base, offset)[0], offset+size
+
+    return read
+
+def _native_array(trait):
+    typecode = trait.FORMAT[-1]
+    size = trait.SIZE
+    swap = _SWAP and size > 1
+
+    def read(base, offset):
+        l, = INT.unpack_from(base, offset)
+        offset += 4
+        result = array(typecode)
+        result.frombytes(base[offset:offset+l*size])
+        if swap:
+            result.byteswap()
+
+        return result, offset+l*size
+
+    return read
+
+def _native_string(base, offset):
+    l, = SHORT.unpack_from(base, offset)
+    offset += 2
+    return str(base[offset:offset+l], "utf8"), offset+l
+
+def _native_list(base, offset):
+    ID, count = LIST_HEADER.unpack_from(base, offset)
+    offset += 5
+    if count <= 0:
+        return [], offset
+
+    trait = TraitMetaclass.TRAITS[ID]
+    if issubclass(trait, AtomTrait):
+        fmt = ">{:d}{}".format(count, trait.FORMAT[-1])
+        return list(struct.unpack_from(fmt, base, offset)), offset+count*trait.SIZE
+
+    read = _NATIVE_READERS[ID]
+    result = []
+    for _ in range(count):
+        item, offset = read(base, offset)
+        result.append(item)
+
+    return result, offset
+
+def _native_compound(base, offset):
+    result = {}
+    while True:
+        ID = base[offset]
+        if ID == 0:
+            return result, offset+1
+
+        ID, l = TAG_HEADER.unpack_from(base, offset)
+        offset += 3
+        name = str(base[offset:offset+l], "utf8")
+        result[name], offset = _NATIVE_READERS[ID](base, offset+l)
+
+_NATIVE_READERS = {
+    ByteTrait.ID: _native_atom(ByteTrait),
+    ShortTrait.ID: _native_atom(ShortTrait),
+    IntTrait.ID: _native_atom(IntTrait),
+    LongTrait.ID: _native_atom(LongTrait),
+    FloatTrait.ID: _native_atom(FloatTrait),
+    DoubleTrait.ID: _native_atom(DoubleTrait),
+    ByteArrayTrait.ID: _native_array(ByteArrayTrait),
+    IntArrayTrait.ID: _native_array(IntArrayTrait),
+    LongArrayTrait.ID: _native_array(LongArrayTrait),
+    StringTrait.ID: _native_string,
+    ListTrait.ID: _native_list,
+    CompoundTrait.ID: _native_compound,
+}
+
+def native_value(node):
+    """ Return the value of a node as plain Python objects, like loads().
+        Unmodified nodes are decoded straight from their payload
+    """
+    if node._payload is not None:
+        return _NATIVE_READERS[node._trait.ID](node._payload, 0)[0]
+
+    if isinstance(node, CompoundNode):
+        return { name: native_value(item) for name, item in dict.items(node) }
+    if isinstance(node, ListNode):
+        return [ native_value(item) for item in list.__iter__(node) ]
+    if isinstance(node, Array):
+        return array(node._trait.FORMAT[-1], node)
+
+    for t in (int, float, str):
+        if isinstance(node, t):
+            return t(node)
+
+    raise TypeError("Cannot convert {} to a native value".format(type(node)))
+
+#------------------------------------
+# Schema
+#------------------------------------
+def _merge_schema(a, b):
+    """ Merge the schema of two items of the same list.
+        Raise ValueError if they use different types for the same data
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        result = dict(a)
+        for key, value in b.items():
+            result[key] = _merge_schema(result[key], value) if key in result else value
+        return result
+
+    if isinstance(a, list) and isinstance(b, list):
+        if a[0] is EndTrait:
+            return b
+        if b[0] is EndTrait:
+            return a
+        if len(a) == 1 and len(b) == 1:
+            return [_merge_schema(a[0], b[0])]
+
+    if a is not b:
+        raise ValueError("Conflicting schemas {} and {}".format(a, b))
+
+    return a
+
+def _schema(base, offset, trait):
+    if trait is CompoundTrait:
+        result = {}
+        while True:
+            item_trait, name, offset = parse_header(base, offset)
+            if item_trait is EndTrait:
+                return result, offset
+            result[name], offset = _schema(base, offset, item_trait)
+
+    if trait is ListTrait:
+        ID, count = LIST_HEADER.unpack_from(base, offset)
+        offset += 5
+        item_trait = TraitMetaclass.TRAITS[ID]
+        if item_trait is not ListTrait and item_trait is not CompoundTrait:
+            for _ in range(max(count, 0)):
+                _, offset = _NATIVE_READERS[ID](base, offset)
+            return [item_trait], offset
+
+        schemas = []
+        for _ in range(count):
+            schema, offset = _schema(base, offset, item_trait)
+            schemas.append(schema)
+
+        if not schemas:
+            # keep the item type of empty lists
+            return [{} if item_trait is CompoundTrait else [EndTrait]], offset
+
+        item_schema = schemas[0]
+        try:
+            for schema in schemas[1:]:
+                item_schema = _merge_schema(item_schema, schema)
+        except ValueError:
+            return schemas, offset
+
+        return [item_schema], offset
+
+    _, offset = _NATIVE_READERS[trait.ID](base, offset)
+    return trait, offset
+
+#------------------------------------
+# Encoding
+#------------------------------------
+_ARRAY_TRAITS = { trait.FORMAT[-1]: trait for trait in (ByteArrayTrait, IntArrayTrait, LongArrayTrait) }
+
+def _native_trait(obj, schema):
+    """ Return the trait used to store obj according to schema
+    """
+    if isinstance(schema, dict):
+        return CompoundTrait
+    if isinstance(schema, list):
+        return ListTrait
+    if schema is not None:
+        return schema
+
+    trait = TYPE_TO_TRAIT.get(type(obj))
+    if trait is IntTrait and not -2**31 <= obj < 2**31:
+        return LongTrait
+    if trait is not None:
+        return trait
+    if isinstance(obj, dict):
+        return CompoundTrait
+    if isinstance(obj, array):
+        return _ARRAY_TRAITS.get(obj.typecode) or IntArrayTrait
+    if isinstance(obj, (bytes, bytearray)):
+        return ByteArrayTrait
+    if isinstance(obj, (list, tuple)):
+        return ListTrait
+    for t, trait in TYPE_TO_TRAIT.items():
+        if isinstance(obj, t):
+            return trait
+
+    raise TypeError("Cannot identify the NBT type for {} ({})".format(obj, type(obj)))
+
+def _dump_payload(out, obj, trait, schema):
+    if trait is CompoundTrait:
+        if not isinstance(schema, dict):
+            schema = {}
+        for name, item in obj.items():
+            item_schema = schema.get(name)
+            item_trait = _native_trait(item, item_schema)
+            name = name.encode('utf8')
+            out += TAG_HEADER.pack(item_trait.ID, len(name))
+            out += name
+            _dump_payload(out, item, item_trait, item_schema)
+        out.append(0)
+
+    elif trait is ListTrait:
+        schemas = schema if isinstance(schema, list) and schema else [None]
+        if not obj:
+            # like Minecraft, write empty lists of unknown type with the End item type
+            item_trait = _native_trait(None, schemas[0]) if schemas[0] is not None else EndTrait
+        else:
+            if schemas[0] is EndTrait:
+                schemas = [None]
+            if len(schemas) != len(obj):
+                schemas = schemas[:1]*len(obj)
+            item_trait = _native_trait(obj[0], schemas[0])
+        if item_trait is IntTrait and schemas[0] is None and not -2**31 <= min(obj) <= max(obj) < 2**31:
+            item_trait = LongTrait
+
+        out += LIST_HEADER.pack(item_trait.ID, len(obj))
+        if issubclass(item_trait, AtomTrait):
+            out += struct.pack(">{:d}{}".format(len(obj), item_trait.FORMAT[-1]), *obj)
+        else:
+            for item, item_schema in zip(obj, schemas):
+                _dump_payload(out, item, item_trait, item_schema)
+
+    elif trait is StringTrait:
+        data = obj.encode('utf8')
+        out += SHORT.pack(len(data))
+        out += data
+
+    elif issubclass(trait, ArrayTrait):
+        typecode = trait.FORMAT[-1]
+        data = array(typecode, obj)
+        if _SWAP and trait.SIZE > 1:
+            data.byteswap()
+        out += INT.pack(len(data))
+        out += data
+
+    else:
+        out += trait.STRUCT.pack(obj)
+
+#------------------------------------
+# Interface
+#------------------------------------
+def loads(data, mode='native'):
+    """ Decode the NBT data of a root tag
+
+        With mode 'native', return the value as plain Python objects:
+        compounds become dict, lists become list, arrays become `array`
+        and other tags become int, float or str. This is much faster than
+        `parse(data)[0].export()` since no node is created.
+
+        With mode 'schema', return the schema of the data, as expected by
+        dumps() to write them back with the same NBT types.
+
+        With mode 'tree', return the root node as parse() does
+    """
+    base = memoryview(data)
+    if mode == 'tree':
+        return parse(base)[0]
+
+    trait, name, offset = parse_header(base, 0)
+    if trait is EndTrait:
+        return None
+
+    if mode == 'native':
+        return _NATIVE_READERS[trait.ID](base, offset)[0]
+    if mode == 'schema':
+        return _schema(base, offset, trait)[0]
+
+    raise ValueError("Unknown mode {!r}".format(mode))
+
+def dumps(obj, name="", *, schema=None):
+    """ Encode a plain Python object as a NBT root tag
+
+        The NBT types are given by `schema` (as returned by `loads(data,
+        mode='schema')`). Its entries can be omitted: the type of those
+        values is then infered from their Python type (int as Int, float
+        as Double, bool as Byte, ...)
+    """
+    trait = _native_trait(obj, schema)
+    name = name.encode('utf8')
+
+    out = bytearray(TAG_HEADER.pack(trait.ID, len(name)))
+    out += name
+    _dump_payload(out, obj, trait, schema)
+
+    return bytes(out)
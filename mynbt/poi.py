@@ -1,24 +1,63 @@
 from mynbt.anvil import Anvil, ZLIB
+from mynbt.views import Record
+
+def records(nbt):
+    """ Return the Record views of the POI stored in a chunk tree
+    """
+    data = nbt._get('Data')
+    sections = data._get('Sections') if data is not None else None
+
+    return [ Record(record) for section in (sections or {}).values()
+                            for record in section._get('Records') or () ]
+
+def move_records(records, cx, cz):
+    """ Update the position of Record views so the chunk can be stored
+        as the chunk (cx, cz) of the world
+
+        Records without a valid position are left unchanged
+    """
+    for record in records:
+        pos = record.pos
+        if pos is None or len(pos) != 3:
+            continue
+        x, y, z = pos
+        record.pos = [x % 16 + 16*cx, y, z % 16 + 16*cz]
+
+def relocate_records(nbt, cx, cz):
+    """ Patch in place the POI positions of a chunk tree parsed from
+        a writable buffer, so it can be stored as the chunk (cx, cz) of
+        the world.
+
+        Return False if no position was changed, True if some position
+        was patched and None if it can't be patched in place
+    """
+    views = records(nbt)
+    move_records(views, cx, cz)
+
+    changed = any(record.dirty for record in views)
+    if not all([ record.flush(in_place=True) for record in views ]):
+        return None
+
+    return changed
 
 class POI(Anvil):
     """ A POI file
     """
-    def write_chunk(self, x, z, nbt, *, compression=ZLIB, timestamp=None):
+    def write_chunk(self, x, z, nbt, *, compression=ZLIB, level=None, timestamp=None):
         # adjust POI positions
-        try:
-            for section in nbt.Data.Sections.values():
-                for record in section.Records:
-                    ex = record.pos[0] % 16
-                    ez = record.pos[2] % 16
-
-                    record.pos[0] = ex + 16*x + 16*32*self._rx
-                    record.pos[2] = ez + 16*z + 16*32*self._rz
-        except KeyError:
-            pass
+        views = records(nbt)
+        move_records(views, 32*self._rx+x, 32*self._rz+z)
+        for record in views:
+            record.flush()
 
-        return super().write_chunk(x, z, nbt, timestamp=timestamp)
+        return super().write_chunk(x, z, nbt, compression=compression, level=level, timestamp=timestamp)
 
     def set_chunk(self, x, z, ci):
+        # Try first to relocate the chunk without parsing it to a tree
+        result = self.relocate_chunk(x, z, ci, lambda nbt : relocate_records(nbt, 32*self._rx+x, 32*self._rz+z))
+        if result is not None:
+            return result
+
         nbt = self.parse_chunk_info(ci)
         return self.write_chunk(x, z, nbt, timestamp=ci.timestamp)
 
@@ -1,7 +1,96 @@
+import zlib
+
 from mynbt.anvil import Anvil, ZLIB
+from mynbt.views import Level
 
 from mynbt.utils import patch
-from mynbt.section import Section
+from mynbt.section import Section, CompactSection, uniform_block_state, is_air
+from mynbt.cache import LRUCache
+
+# ====================================================================
+# Utilities
+# ====================================================================
+def chunk_token(chunk_info):
+    """ A cheap fingerprint of the chunk data used to detect stale cache entries.
+        None for chunks whose compression is deferred
+    """
+    data = chunk_info.data
+    if data is None:
+        return None
+
+    return chunk_info.timestamp, len(data), zlib.crc32(data)
+
+def tree_size(nbt, chunk_info):
+    """ Estimate the memory footprint of a parsed chunk.
+
+        This is the size of the uncompressed NBT data when known,
+        the size of the compressed data otherwise
+    """
+    if nbt._payload is not None:
+        return len(nbt._payload)
+
+    if chunk_info.data is None:
+        # compression deferred. See WithCache.chunk_compressed()
+        return 0
+
+    return len(chunk_info.data)
+
+def flush_sections(nbt):
+    """ Write back the modified sections cached for the chunk
+        into its NBT tree
+    """
+    cache = vars(nbt).get('_sections')
+    if not cache:
+        return
+
+    sections, version, index, decoded = cache
+    for y, (node, section) in list(decoded.items()):
+        if section.dirty:
+            new_node = section.toNBT()
+            if node is None:
+                nbt['Level']['Sections'].append(new_node)
+                decoded[y] = (new_node, section)
+
+def move_level(level, cx, cz):
+    """ Update the position fields of a Level view so the chunk
+        can be stored as the chunk (cx, cz) of the world
+
+        Entities without a valid position are left unchanged
+    """
+    level.xPos = cx
+    level.zPos = cz
+
+    for entity in level.Entities:
+        pos = entity.Pos
+        if pos is None or len(pos) != 3:
+            continue
+        x, y, z = pos
+        entity.Pos = [x % 16 + 16*cx, y, z % 16 + 16*cz]
+
+    for entity in level.TileEntities:
+        if entity.x is not None:
+            entity.x = entity.x % 16 + 16*cx
+        if entity.z is not None:
+            entity.z = entity.z % 16 + 16*cz
+
+def relocate_level(nbt, cx, cz):
+    """ Patch in place the position fields of a chunk tree parsed from
+        a writable buffer, so it can be stored as the chunk (cx, cz) of
+        the world.
+
+        Return False if the chunk was already at (cx, cz), True if it was
+        patched and None if it can't be patched in place
+    """
+    node = nbt._get('Level')
+    if node is None:
+        return None
+
+    level = Level(node)
+    if (level.xPos, level.zPos) == (cx, cz):
+        return False
+
+    move_level(level, cx, cz)
+    return True if level.flush(in_place=True) else None
 
 #------------------------------------
 # Region
@@ -14,77 +103,167 @@ class Region(Anvil):
 
         return nbt
 
-    def write_chunk(self, x, z, nbt, *, compression=ZLIB, timestamp=None):
-        data_rx, data_cx = divmod(nbt.Level.xPos, 32)
-        data_rz, data_cz = divmod(nbt.Level.zPos, 32)
-
-        # adjust region pos
-        nbt.Level.xPos = 32*self._rx+x
-        nbt.Level.zPos = 32*self._rz+z
-
-        # adjust entity positions
-        try:
-            for entity in nbt.Level.Entities:
-                ex = entity.Pos[0] % 16
-                ez = entity.Pos[2] % 16
-
-                entity.Pos[0] = ex + 16*x + 16*32*self._rx
-                entity.Pos[2] = ez + 16*z + 16*32*self._rz
-        except KeyError:
-            pass
+    def write_chunk(self, x, z, nbt, *, compression=ZLIB, level=None, timestamp=None):
+        flush_sections(nbt)
 
-        # adjust tile entity positions
-        try:
-            for entity in nbt.Level.TileEntities:
-                ex = entity.x % 16
-                ez = entity.z % 16
+        # adjust the chunk, entity and tile entity positions
+        view = Level(nbt['Level'])
+        move_level(view, 32*self._rx+x, 32*self._rz+z)
+        view.flush()
 
-                entity.x = ex + 16*x + 16*32*self._rx
-                entity.z = ez + 16*z + 16*32*self._rz
-        except KeyError:
-            pass
-
-        return super().write_chunk(x, z, nbt, timestamp=timestamp)
+        return super().write_chunk(x, z, nbt, compression=compression, level=level, timestamp=timestamp)
 
     def set_chunk(self, x, z, ci):
+        # Try first to relocate the chunk without parsing it to a tree
+        result = self.relocate_chunk(x, z, ci, lambda nbt : relocate_level(nbt, 32*self._rx+x, 32*self._rz+z))
+        if result is not None:
+            return result
+
         nbt = self.parse_chunk_info(ci)
         return self.write_chunk(x, z, nbt, timestamp=ci.timestamp)
 
     @classmethod
-    def withCache(cls):
-        cache = {}
+    def withCache(cls, cache=None):
+        """ Return a Region subclass keeping parsed chunks in `cache`
+
+            Cached chunks are keyed by (region name, x, z), so a single
+            cache can be shared among all the regions of a world. Regions
+            created without a name have no stable identity: their chunks
+            are keyed by a per-instance token, so they are cached but never
+            shared with another region. An entry is considered stale if the tree has been
+            modified without being written back, or if the chunk data it
+            was parsed from have changed.
+        """
+        if cache is None:
+            cache = LRUCache()
+
         class WithCache(cls):
+            def __init__(self, rx, rz, data=b"", *, name=None, **kwargs):
+                super().__init__(rx, rz, data, name=name, **kwargs)
+                self._cache_name = name if name is not None else object()
+
+            def _cache_key(self, x, z):
+                return self._cache_name, x, z
+
             def parse_chunk_info(self, chunk_info):
-                key = chunk_info.x, chunk_info.z
-                try:
-                    nbt, version = cache[key]
+                key = self._cache_key(chunk_info.x, chunk_info.z)
+                if (chunk_info.rx, chunk_info.rz) != (self._rx, self._rz):
+                    # foreign chunk (e.g. set_chunk from another region)
+                    return super().parse_chunk_info(chunk_info)
 
-                    if nbt._version == version:
+                entry = cache.get(key)
+                if entry is not None:
+                    nbt, version, token, size = entry
+                    if nbt._version == version and token == chunk_token(chunk_info):
                         return nbt
-                except KeyError:
-                    pass
+
+                    cache.discard(key)
 
                 nbt = super().parse_chunk_info(chunk_info)
-                cache[key] = (nbt, nbt._version)
+                if nbt is not None:
+                    size = tree_size(nbt, chunk_info)
+                    cache.put(key, (nbt, nbt._version, chunk_token(chunk_info), size), size)
 
                 return nbt
 
-            def write_chunk(self, x, z, nbt, *, compression=ZLIB, timestamp=None):
-                cache[x,z] = (nbt, nbt._version)
-                return super().write_chunk(x,z,nbt,compression=compression, timestamp=timestamp)
+            def write_chunk(self, x, z, nbt, *, compression=ZLIB, level=None, timestamp=None):
+                ci = super().write_chunk(x,z,nbt,compression=compression, level=level, timestamp=timestamp)
+
+                key = self._cache_key(x, z)
+                entry = cache.peek(key)
+                size = entry[3] if entry is not None else tree_size(nbt, ci)
+                cache.put(key, (nbt, nbt._version, chunk_token(ci), size), size)
+
+                return ci
+
+            def chunk_compressed(self, chunk_info):
+                # fingerprint the cached trees written with deferred compression
+                key = self._cache_key(chunk_info.x, chunk_info.z)
+                entry = cache.peek(key)
+                if entry is not None and entry[2] is None:
+                    nbt, version, token, size = entry
+                    size = size or tree_size(nbt, chunk_info)
+                    cache.put(key, (nbt, version, chunk_token(chunk_info), size), size)
+
+            def set_chunk_info(self, info):
+                cache.discard(self._cache_key(info.x, info.z))
+
+                return super().set_chunk_info(info)
 
+            def uncache(self):
+                """ Drop all the cached chunks of the region
+                """
+                cache.discard_if(lambda key: key[0] == self._cache_name)
 
+        WithCache.cache = cache
         return WithCache
 
     class Chunk(Anvil.Chunk):
-        def sections(self, filter=lambda section : True):
-            level = self.nbt['Level']
-            for section in level['Sections']:
+        def modified(self):
+            if super().modified():
+                return True
+
+            cache = self._nbt is not None and vars(self._nbt).get('_sections')
+            return bool(cache) and any(section.dirty for node, section in cache[3].values())
+
+        def _section_cache(self):
+            """ Return the (index, decoded) pair of dictionaries caching
+                the sections of the chunk by Y.
+
+                The cache is attached to the NBT tree so it is shared by
+                all the Chunk objects wrapping the same tree. The index is
+                rebuilt whenever the section list has changed.
+            """
+            nbt = self.nbt
+            sections = nbt['Level']['Sections']
+            cache = vars(nbt).get('_sections')
+            if cache is None or cache[0] is not sections or cache[1] != sections._version:
+                decoded = cache[3] if cache is not None else {}
+                index = { int(section['Y']): section for section in sections }
+                decoded = { y: entry for y, entry in decoded.items() if index.get(y) is entry[0] }
+                nbt._sections = cache = (sections, sections._version, index, decoded)
+
+            return cache[2:]
+
+        def sections(self, filter=lambda section : True, *, compact=False, non_empty=False):
+            """ Iterate over the sections of the chunk.
+
+                `filter` is called with the NBT data of each section.
+                If `non_empty` is set, sections known to contain only air
+                from their palette are skipped without being decoded.
+            """
+            index, decoded = self._section_cache()
+            for y, section in list(index.items()):
+                if non_empty:
+                    cached = decoded.get(y)
+                    state = cached[1].uniform_state() if cached else uniform_block_state(section)
+                    if state is not None and is_air(state):
+                        continue
+
                 if filter(section):
-                    yield Section.fromNBT(level.xPos, level.zPos, section)
+                    yield self.section(y, compact=compact)
+
+        def section(self, y, *, compact=False):
+            """ Return the section at height y.
 
-        def section(self, y):
+                Sections not decoded yet are decoded as a CompactSection
+                if `compact` is set. Already decoded sections are returned
+                as they are.
+            """
+            index, decoded = self._section_cache()
             try:
-                return next(self.sections(filter=lambda section : section.Y == y))
-            except StopIteration:
-                return Section.new(self.nbt.Level.xPos, idx, self.nbt.Level.zPos)
+                return decoded[y][1]
+            except KeyError:
+                pass
+
+            level = self.nbt['Level']
+            node = index.get(y)
+            factory = CompactSection if compact else Section
+            if node is None:
+                # attached to the section list when written back
+                result = factory.new(level.xPos, y, level.zPos)
+            else:
+                result = factory.fromNBT(level.xPos, level.zPos, node)
+
+            decoded[y] = (node, result)
+            return result
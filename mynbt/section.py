@@ -1,8 +1,11 @@
-from mynbt.bitpack import unpack, UINT_16, INT_64
+from mynbt.bitpack import unpack, pack, UINT_16, INT_64
+from mynbt.nbt import Node, CompoundNode, ListNode, CompoundTrait, Integer
 
 from collections import namedtuple
 from pprint import pprint
 from array import array
+from bisect import bisect_left, bisect_right
+import itertools
 
 # ====================================================================
 # Structs
@@ -52,6 +55,10 @@ def block_map_from_text_map(palette, *xz_planes):
 # ====================================================================
 # Utilities
 # ====================================================================
+FULL_RANGE = range(0,16)
+""" The range of block coordinates spanning a whole section
+"""
+
 def idx2pos(idx):
     r,x = divmod(idx, 16)
     y,z = divmod(r, 16)
@@ -108,7 +115,7 @@ def blit(src, src_start, dst, dst_start, width, height, depth):
         for z in range(depth):
             for x in range(width):
                 blk = src.blocks[src_idx+x]
-                while blk > len(map):
+                while blk >= len(map):
                     map.extend(map_ext)
 
                 if map[blk] is None:
@@ -119,6 +126,63 @@ def blit(src, src_start, dst, dst_start, width, height, depth):
             src_idx += src.row_span
             dst_idx += dst.row_span
 
+    if isinstance(dst, Section):
+        dst.invalidate()
+
+def runs_from_blocks(blocks):
+    """ Run-length encode a block sequence.
+
+        Return a (starts, values) pair of arrays where run n covers
+        indices starts[n] up to (excluding) starts[n+1]
+    """
+    starts = array(UINT_16)
+    values = array(UINT_16)
+    idx = 0
+    for value, run in itertools.groupby(blocks):
+        starts.append(idx)
+        values.append(value)
+        idx += sum(1 for _ in run)
+
+    return starts, values
+
+def blocks_from_runs(runs, size=16*16*16):
+    """ Expand a (starts, values) pair of arrays back to a block sequence
+    """
+    starts, values = runs
+    blocks = array(UINT_16)
+    ends = itertools.chain(starts[1:], (size,))
+    for start, end, value in zip(starts, ends, values):
+        blocks.extend(array(UINT_16, [value])*(end-start))
+
+    return blocks
+
+AIR_BLOCKS = frozenset(("minecraft:air", "minecraft:cave_air", "minecraft:void_air"))
+""" Names of the block states considered as air
+"""
+
+def is_air(blockstate):
+    return blockstate['Name'] in AIR_BLOCKS
+
+def uniform_block_state(section):
+    """ Return the block state filling an NBT section if this can be
+        told from its palette alone, None otherwise.
+
+        The BlockStates array is never decoded. Sections without
+        a palette only hold light data and are reported as air.
+    """
+    palette = section.get('Palette')
+    if not palette:
+        return dict(Name="minecraft:air")
+    if len(palette) == 1:
+        return palette[0]
+
+    return None
+
+def section_nbits(palette):
+    """ Return the number of bits per block required to index the palette
+    """
+    return max(4,(len(palette)-1).bit_length())
+
 
 # ====================================================================
 # Section
@@ -127,36 +191,59 @@ class Section:
     #------------------------------------
     # Ctor / Factories
     #------------------------------------
-    def __init__(self, cx, cy, cz, palette=None, blocks=None):
+    def __init__(self, cx, cy, cz, palette=None, blocks=None, *, nbt=None, packed=None):
+        """ Create a section.
+
+            Instead of `blocks`, the caller may provide `packed`, a
+            (nbits, BlockStates) tuple. Blocks are then unpacked on
+            first access.
+        """
         if not palette:
             palette=[dict(Name="minecraft:air")]
-        if not blocks:
-            blocks = array(UINT_16, (0 for i in range(4096)))
+        if not blocks and packed is None:
+            blocks = array(UINT_16, bytes(2*4096))
 
         self._cx = cx
         self._cy = cy
         self._cz = cz
         self._palette = palette
-        self._blocks = blocks
+        self._buffer = blocks
+        self._packed = packed
+        self._nbt = nbt
+        self._dirty = False
 
-        assert len(blocks) == 4096
+        assert blocks is None or len(blocks) == 4096
+
+    @property
+    def _blocks(self):
+        if self._buffer is None:
+            nbits, blockstates = self._packed
+            self._buffer = unpack(nbits, 64, blockstates, array(UINT_16))
+            self._packed = None
+
+        return self._buffer
+
+    @_blocks.setter
+    def _blocks(self, blocks):
+        self._buffer = blocks
+        self._packed = None
 
     @classmethod
     def fromNBT(cls, cx, cz, section):
-        palette = section.get('Palette')
-        if not palette:
-            section['Palette'] = dict(Name="minecraft:air")
-            palette = section['Palette']
+        """ Decode a section from its NBT representation.
 
-        nbits = lambda : max(4,(len(palette)-1).bit_length())
+            The NBT data are left untouched until `toNBT()` is called
+            on a modified section.
+        """
+        palette = list(section.get('Palette') or ())
 
-        blockstate = section.get('BlockStates')
-        if not blockstate:
-            section['BlockState'] = array(INT_64, (0 for x in range(16*16*16*nbits()//64)))
-            blockstate = section['BlockState']
+        blockstates = section.get('BlockStates')
+        if blockstates:
+            packed = (section_nbits(palette), blockstates)
+        else:
+            packed = None
 
-        blockstate.reshape(nbits)
-        return cls(cx, section['Y'], cz, palette, blockstate)
+        return cls(cx, section['Y'], cz, palette, nbt=section, packed=packed)
 
     @classmethod
     def new(cls, cx, cy, cz):
@@ -173,7 +260,7 @@ class Section:
         def _copy(section, blocks, row, *args):
             for n in range(row.start, row.stop):
                 blk = blocks[n]
-                while blk > len(map):
+                while blk >= len(map):
                     map.extend([None]*10)
 
                 if map[blk] is None:
@@ -181,15 +268,51 @@ class Section:
 
                 result._blocks[n] = map[blk]
 
-        section.row_apply(_copy, rx,ry,rz)
+        section.row_apply(_copy, rx,ry,rz, readonly=True)
+        result.invalidate()
 
         return result
 
+    #------------------------------------
+    # NBT conversion
+    #------------------------------------
+    def toNBT(self):
+        """ Return the NBT compound for the section.
+
+            Blocks are repacked into the `BlockStates` array only
+            if the section was modified. Clean sections return their
+            NBT data unchanged.
+        """
+        section = self._nbt
+        if section is None:
+            section = self._nbt = CompoundNode()
+            section['Y'] = Integer.fromNativeObject(self._cy, typecode='b')
+        elif not self._dirty:
+            return section
+
+        self.compact()
+        nbits = section_nbits(self._palette)
+        blockstates = array(INT_64)
+        if len(self._palette) == 1:
+            # uniform section
+            blockstates.frombytes(bytes(16*16*16*nbits//8))
+        else:
+            blockstates.frombytes(pack(64, nbits, self._blocks).tobytes())
+
+        section['Palette'] = ListNode.fromNativeObject(
+            [blockstate.export() if isinstance(blockstate, Node) else blockstate for blockstate in self._palette],
+            child_trait=CompoundTrait
+        )
+        section['BlockStates'] = blockstates
+        self._dirty = False
+
+        return section
+
     #------------------------------------
     # String conversion
     #------------------------------------
     def __repr__(self):
-        return "Section({_cx},{_cy},{_cz},{_palette},{_blocks})".format(**vars(self))
+        return "Section({},{},{},{},{})".format(self._cx, self._cy, self._cz, self._palette, self._blocks)
 
     def __str__(self):
         return "Section({_cx},{_cy},{_cz})".format(**vars(self))
@@ -205,6 +328,37 @@ class Section:
         """
         return block_state_index(self._palette, **blockstate)
 
+    def compact(self):
+        """ Remove the unused entries from the palette, renumbering
+            the blocks accordingly
+        """
+        used = set(self._blocks)
+        if len(used) == len(self._palette):
+            return
+
+        keep = sorted(used)
+        remap = [0]*len(self._palette)
+        for new, old in enumerate(keep):
+            remap[old] = new
+
+        self._blocks = array(UINT_16, map(remap.__getitem__, self._blocks))
+        self._palette = [self._palette[old] for old in keep]
+        self._dirty = True
+
+    def uniform_state(self):
+        """ Return the block state filling the section if this can
+            be told from the palette alone, None otherwise
+        """
+        if len(self._palette) == 1:
+            return self._palette[0]
+
+        return None
+
+    def invalidate(self):
+        """ Mark the section as modified
+        """
+        self._dirty = True
+
     #------------------------------------
     # Properties
     #------------------------------------
@@ -248,6 +402,10 @@ class Section:
     def palette(self):
         return self._palette
 
+    @property
+    def dirty(self):
+        return self._dirty
+
     #------------------------------------
     # Block access
     #------------------------------------
@@ -284,13 +442,18 @@ class Section:
     #------------------------------------
     # World modifications
     #------------------------------------
-    def row_apply(self, fct, xrange, yrange, zrange):
+    def row_apply(self, fct, xrange, yrange, zrange, *, readonly=False):
         """ Apply a function to each x-row of the range
 
             `fct` is a callable with the signature `fct(section, block, slice, y, z)`
             `block[slice]` is the section of a row where the function
             should apply.
+
+            Unless `readonly` is set, the section is assumed to be modified
         """
+        if not readonly:
+            self.invalidate()
+
         base = pos2idx(xrange.start, yrange.start, zrange.start)
 
         row_size = self.width
@@ -306,7 +469,23 @@ class Section:
 
     def fill(self, xrange=range(0,16), yrange=range(0,16), zrange=range(0,16), **blockstate):
         """ Fill a range of blocks
+
+            Filling whole xz planes does not require per-row work.
+            Filling the whole section resets it to a single-entry palette.
         """
+        if xrange == FULL_RANGE and zrange == FULL_RANGE:
+            if yrange == FULL_RANGE:
+                self._palette = [blockstate]
+                self._blocks = array(UINT_16, bytes(2*16*16*16))
+            else:
+                blk = self.block_state_index(**blockstate)
+                start = pos2idx(0, yrange.start, 0)
+                end = pos2idx(0, yrange.stop, 0)
+                self._blocks[start:end] = array(UINT_16, [blk])*(end-start)
+
+            self.invalidate()
+            return
+
         blk = self.block_state_index(**blockstate)
         seq = array(self._blocks.typecode, (blk for i in xrange))
 
@@ -316,3 +495,128 @@ class Section:
         self.row_apply(fct, xrange, yrange, zrange)
 
 
+
+
+# ====================================================================
+# Compact section
+# ====================================================================
+class CompactSection(Section):
+    """ A section storing its blocks as runs in x/z/y order.
+
+        Most sections are almost uniform, so runs take far less memory
+        than the 4096 entries block array. Block lookups and fills
+        of whole planes work directly on the runs. Operations requiring
+        random access to the blocks (row_apply, blit, ...) expand them.
+        `collapse()` switches back to the run-length representation.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._runs = None
+        self.collapse()
+
+    @property
+    def _blocks(self):
+        if self._runs is not None:
+            self._buffer = blocks_from_runs(self._runs)
+            self._runs = None
+
+        return Section._blocks.fget(self)
+
+    @_blocks.setter
+    def _blocks(self, blocks):
+        self._runs = None
+        Section._blocks.fset(self, blocks)
+
+    @property
+    def expanded(self):
+        return self._runs is None
+
+    def collapse(self):
+        """ Run-length encode the blocks, releasing the block array
+        """
+        if self._runs is None:
+            self._runs = runs_from_blocks(self._blocks)
+            self._buffer = None
+
+    #------------------------------------
+    # Overridden methods
+    #------------------------------------
+    def block(self, x,y,z):
+        if self._runs is None:
+            return super().block(x,y,z)
+
+        assert 0 <= x < 16
+        assert 0 <= y < 16
+        assert 0 <= z < 16
+
+        starts, values = self._runs
+        return self._palette[values[bisect_right(starts, pos2idx(x,y,z))-1]]
+
+    def fill(self, xrange=range(0,16), yrange=range(0,16), zrange=range(0,16), **blockstate):
+        if self._runs is None or xrange != FULL_RANGE or zrange != FULL_RANGE:
+            return super().fill(xrange, yrange, zrange, **blockstate)
+
+        if yrange == FULL_RANGE:
+            self._palette = [blockstate]
+            self._runs = (array(UINT_16, [0]), array(UINT_16, [0]))
+        else:
+            blk = self.block_state_index(**blockstate)
+            self._splice(pos2idx(0, yrange.start, 0), pos2idx(0, yrange.stop, 0), blk)
+
+        self.invalidate()
+
+    def compact(self):
+        if self._runs is None:
+            return super().compact()
+
+        starts, values = self._runs
+        used = set(values)
+        if len(used) == len(self._palette):
+            return
+
+        keep = sorted(used)
+        remap = [0]*len(self._palette)
+        for new, old in enumerate(keep):
+            remap[old] = new
+
+        self._runs = (starts, array(UINT_16, map(remap.__getitem__, values)))
+        self._palette = [self._palette[old] for old in keep]
+        self._dirty = True
+
+    def toNBT(self):
+        collapsed = self._runs is not None
+        result = super().toNBT()
+        if collapsed:
+            self.collapse()
+
+        return result
+
+    #------------------------------------
+    # Run management
+    #------------------------------------
+    def _splice(self, start, end, value):
+        """ Set blocks in the [start, end) index range to value
+        """
+        starts, values = self._runs
+        head = bisect_left(starts, start)
+        tail = bisect_right(starts, end)
+
+        new_starts = starts[:head]
+        new_values = values[:head]
+        new_starts.append(start)
+        new_values.append(value)
+        if end < 16*16*16:
+            new_starts.append(end)
+            new_values.append(values[tail-1])
+            new_starts.extend(starts[tail:])
+            new_values.extend(values[tail:])
+
+        # merge adjacent runs of the same value
+        runs = (array(UINT_16), array(UINT_16))
+        for run_start, run_value in zip(new_starts, new_values):
+            if runs[1] and runs[1][-1] == run_value:
+                continue
+            runs[0].append(run_start)
+            runs[1].append(run_value)
+
+        self._runs = runs
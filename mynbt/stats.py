@@ -0,0 +1,88 @@
+""" Block statistics over sections, chunks, regions and worlds
+
+    Histograms are `collections.Counter` objects mapping a block key
+    (by default the block name) to a block count. They can be merged
+    with the `+` operator.
+"""
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from mynbt.section import Section
+from mynbt.world import World
+
+# ====================================================================
+# Utilities
+# ====================================================================
+def block_name(blockstate):
+    """ The default histogram key: the block name, ignoring properties
+    """
+    return str(blockstate['Name'])
+
+# ====================================================================
+# Histograms
+# ====================================================================
+def section_histogram(section, key=block_name):
+    """ Count the blocks of a section
+
+        Uniform sections are answered from their palette alone. Otherwise
+        blocks are counted by palette index in a single pass.
+    """
+    result = Counter()
+    palette = section.palette
+
+    state = section.uniform_state()
+    if state is not None:
+        result[key(state)] = 16*16*16
+        return result
+
+    for idx, count in Counter(section.blocks).items():
+        result[key(palette[idx])] += count
+
+    return result
+
+def chunk_histogram(chunk, key=block_name):
+    """ Count the blocks of all the sections stored in a chunk
+    """
+    result = Counter()
+    for section in chunk.sections():
+        result.update(section_histogram(section, key))
+
+    return result
+
+def region_histogram(region, key=block_name):
+    """ Count the blocks of all the chunks of a region
+    """
+    result = Counter()
+    for chunk in region.chunks():
+        result.update(chunk_histogram(chunk, key))
+
+    return result
+
+def _region_file_histogram(dirname, rx, rz, key):
+    """ Worker process entry point for world_histogram
+    """
+    return region_histogram(World(dirname).region(rx, rz), key)
+
+def world_histogram(world, regions=None, *, key=block_name, workers=None):
+    """ Count the blocks of the given regions of a world (all the regions
+        by default)
+
+        If `workers` is set, regions are processed in parallel by that
+        many worker processes. `key` must then be picklable.
+    """
+    if regions is None:
+        regions = world.region_coords()
+
+    result = Counter()
+    if workers:
+        dirname = world._dirname
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [ executor.submit(_region_file_histogram, dirname, rx, rz, key) for rx, rz in regions ]
+            for future in futures:
+                result.update(future.result())
+    else:
+        for rx, rz in regions:
+            result.update(region_histogram(world.region(rx, rz), key))
+
+    return result
@@ -1,3 +1,8 @@
+import os
+import os.path
+import shutil
+from contextlib import contextmanager
+
 hexdump_map_hex = tuple( format(i, '02x') for i in range(256) )
 hexdump_map_txt = "".join(("."*32, *(chr(i) for i in range(32,127)), "."*129))
 
@@ -42,12 +47,96 @@ def hexdump(data, maxlines=-1, compact=True):
         addr += 16
 
 
-def withsave(path, writer=open, test=lambda : True):
+def writev_all(fd, buffers):
+    """ Write all the buffers to the file descriptor fd using as few
+        `os.writev` calls as possible
+    """
+    try:
+        iov_max = os.sysconf('SC_IOV_MAX')
+    except (ValueError, OSError, AttributeError):
+        iov_max = 1024
+
+    buffers = [ memoryview(buffer).cast('B') for buffer in buffers if len(buffer) ]
+    first = 0
+    while first < len(buffers):
+        written = os.writev(fd, buffers[first:first+iov_max])
+
+        # skip the fully written buffers, and the written part of the next one
+        while first < len(buffers) and written >= len(buffers[first]):
+            written -= len(buffers[first])
+            first += 1
+        if written:
+            buffers[first] = buffers[first][written:]
+
+def fsync_path(path):
+    """ Flush the file (or directory) at path to the storage device
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_open(path, writer=open):
+    """ Context manager returning an output stream that replaces the file
+        at path once closed without error
+
+        Data are written to a temporary file in the same directory, flushed
+        to the device, then renamed over `path`. Readers see either the
+        old or the new file, never a partially written one. The temporary
+        file is removed if an exception is raised.
+    """
+    dirname = os.path.dirname(path) or os.curdir
+    prefix = "."+os.path.basename(path)+"."
+    while True:
+        # like open(), create new files with the mode 0o666 minus the umask
+        tmp = os.path.join(dirname, prefix + os.urandom(6).hex() + ".tmp")
+        try:
+            os.close(os.open(tmp, os.O_CREAT|os.O_EXCL|os.O_WRONLY, 0o666))
+            break
+        except FileExistsError:
+            continue
+
+    try:
+        with writer(tmp, 'wb') as output:
+            yield output
+
+        fsync_path(tmp)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+    try:
+        fsync_path(dirname)
+    except OSError:
+        pass # not supported on all platforms
+
+def withsave(path, writer=open, test=lambda : True, prepare=lambda : None, saved=lambda : None):
+    """ Return a behavior adding save() and the context manager protocol
+
+        `prepare` is called before the output file is opened. It should
+        load any data still backed by that file. `saved` is called once
+        the file was successfully replaced, so `test` no longer reports
+        the object as modified.
+
+        Files are saved atomically (see atomic_open())
+    """
     class WithSave:
         def save(self):
-            with writer(path, 'wb') as output:
+            prepare()
+            with atomic_open(path, writer) as output:
                 self.write_to(output)
 
+            saved()
+
         @property
         def filepath(self):
             return path
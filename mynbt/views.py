@@ -0,0 +1,252 @@
+""" Typed views over the NBT tree of chunks
+
+    A view wraps a compound node and exposes a fixed set of its fields
+    as plain Python values. Fields are decoded from the node payload on
+    first access only, and views remember which fields were assigned.
+    `flush()` writes the modified fields back to the node: in place in
+    the source buffer when possible (see mynbt.nbt.patch_in_place) so
+    the tree is not invalidated, by replacing the node items otherwise.
+
+    View classes are generated by `view_type()` and use `__slots__`.
+"""
+
+from array import array
+
+from mynbt.nbt import (
+    native_value, patch_in_place,
+    ListNode, AtomProxy, ArrayProxy,
+    ByteTrait, IntTrait, LongTrait, FloatTrait, DoubleTrait, StringTrait,
+    ByteArrayTrait, IntArrayTrait, LongArrayTrait, ListTrait, CompoundTrait,
+)
+
+# ====================================================================
+# Fields
+# ====================================================================
+class Field:
+    """ A field holding the value of the NBT item `key`, as returned by
+        mynbt.nbt.native_value(). Missing items have the value None.
+
+        `trait` is the NBT type used when the item must be created or
+        replaced. For lists, `item` is the trait of the list items.
+    """
+    def __init__(self, key, trait, item=None):
+        self.key = key
+        self.trait = trait
+        self.item = item
+        self.slot = None
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+
+        try:
+            return getattr(view, self.slot)
+        except AttributeError:
+            pass
+
+        node = view._node._get(self.key)
+        value = None if node is None else native_value(node)
+        setattr(view, self.slot, value)
+        return value
+
+    def __set__(self, view, value):
+        if _equal(self.__get__(view), value):
+            return
+
+        setattr(view, self.slot, value)
+        view._dirty.add(self)
+
+    def store(self, node, value, *, in_place=False):
+        """ Write value as node[key]. Return False if that was not possible
+        """
+        if value is None:
+            return True
+
+        if _patch(node, self.key, value):
+            return True
+
+        if in_place:
+            return False
+
+        old = node._get(self.key)
+        if isinstance(old, ListNode):
+            node[self.key] = ListNode.fromNativeObject(value, child_trait=old._child_trait)
+        elif self.item is not None:
+            node[self.key] = ListNode.fromNativeObject(value, child_trait=self.item)
+        else:
+            node[self.key] = self.trait.instanceFromValue(value)
+
+        return True
+
+class ViewList(Field):
+    """ A field holding the list of the views of the compounds
+        stored in the list item `key`. Missing lists are empty.
+
+        The list itself can't be assigned, but its views can be modified
+    """
+    def __init__(self, key, view):
+        super().__init__(key, ListTrait, CompoundTrait)
+        self.view = view
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+
+        try:
+            return getattr(view, self.slot)
+        except AttributeError:
+            pass
+
+        value = [ self.view(item) for item in view._node._get(self.key) or () ]
+        setattr(view, self.slot, value)
+        return value
+
+    def __set__(self, view, value):
+        raise AttributeError("Can't set the view list " + self.key)
+
+def _patch(node, key, value):
+    """ Write value as node[key] in the node source buffer.
+        Return False if that's not possible
+    """
+    item = node._get(key)
+    if isinstance(item, ListNode):
+        return len(item) == len(value) and all(
+            patch_in_place(item, idx, _const(v)) for idx, v in enumerate(value)
+        )
+
+    if isinstance(item, ArrayProxy):
+        count = (len(item._payload)-4) // item._trait.SIZE
+        return count == len(value) and all(
+            patch_in_place(node, key, _const(v), idx) for idx, v in enumerate(value)
+        )
+
+    if isinstance(item, AtomProxy):
+        return patch_in_place(node, key, _const(value))
+
+    return False
+
+def _equal(a, b):
+    if isinstance(a, array) or isinstance(b, array):
+        try:
+            return list(a) == list(b)
+        except TypeError:
+            return False
+
+    return a == b
+
+def _const(value):
+    return lambda _ : value
+
+# ====================================================================
+# Views
+# ====================================================================
+class View:
+    """ Base class for the views
+    """
+    __slots__ = ('_node', '_dirty')
+    FIELDS = ()
+
+    def __init__(self, node):
+        self._node = node
+        self._dirty = set()
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(name, getattr(self, name)) for name in self.FIELDS
+            if not isinstance(getattr(type(self), name), ViewList)
+        ))
+
+    @property
+    def node(self):
+        return self._node
+
+    @property
+    def dirty(self):
+        """ True if some field of the view or of its nested views
+            was modified and not flushed yet
+        """
+        return bool(self._dirty) or any(item.dirty for item in self._nested())
+
+    def _nested(self):
+        cls = type(self)
+        for name in self.FIELDS:
+            field = getattr(cls, name)
+            if isinstance(field, ViewList):
+                yield from getattr(self, field.slot, ())
+
+    def flush(self, *, in_place=False):
+        """ Write the modified fields back to the node
+
+            With `in_place` set, fields are only written in the node source
+            buffer. Return False if some field couldn't be written that way
+        """
+        result = True
+        for item in self._nested():
+            result = item.flush(in_place=in_place) and result
+
+        for field in list(self._dirty):
+            if field.store(self._node, getattr(self, field.slot), in_place=in_place):
+                self._dirty.discard(field)
+            else:
+                result = False
+
+        return result
+
+def view_type(name, doc=None, **fields):
+    """ Create a View subclass exposing the given fields
+    """
+    dct = {
+        '__slots__': tuple('_f_' + attr for attr in fields),
+        '__doc__': doc,
+        'FIELDS': tuple(fields),
+    }
+    for attr, field in fields.items():
+        field.slot = '_f_' + attr
+        dct[attr] = field
+
+    return type(name, (View,), dct)
+
+#------------------------------------
+# Chunk format
+#------------------------------------
+Entity = view_type("Entity", """ An entity of a chunk """,
+    id=Field('id', StringTrait),
+    Pos=Field('Pos', ListTrait, DoubleTrait),
+    Motion=Field('Motion', ListTrait, DoubleTrait),
+    Rotation=Field('Rotation', ListTrait, FloatTrait),
+)
+
+TileEntity = view_type("TileEntity", """ A tile (block) entity of a chunk """,
+    id=Field('id', StringTrait),
+    x=Field('x', IntTrait),
+    y=Field('y', IntTrait),
+    z=Field('z', IntTrait),
+)
+
+Section = view_type("Section", """ A 16x16x16 section of a chunk """,
+    Y=Field('Y', ByteTrait),
+    Palette=Field('Palette', ListTrait, CompoundTrait),
+    BlockStates=Field('BlockStates', LongArrayTrait),
+    BlockLight=Field('BlockLight', ByteArrayTrait),
+    SkyLight=Field('SkyLight', ByteArrayTrait),
+)
+
+Level = view_type("Level", """ The Level compound of a chunk """,
+    xPos=Field('xPos', IntTrait),
+    zPos=Field('zPos', IntTrait),
+    LastUpdate=Field('LastUpdate', LongTrait),
+    InhabitedTime=Field('InhabitedTime', LongTrait),
+    Status=Field('Status', StringTrait),
+    Sections=ViewList('Sections', Section),
+    Entities=ViewList('Entities', Entity),
+    TileEntities=ViewList('TileEntities', TileEntity),
+)
+
+#------------------------------------
+# POI format
+#------------------------------------
+Record = view_type("Record", """ A point of interest """,
+    pos=Field('pos', IntArrayTrait),
+    type=Field('type', StringTrait),
+    free_tickets=Field('free_tickets', IntTrait),
+)
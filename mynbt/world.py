@@ -3,12 +3,17 @@ import os.path
 import glob
 import itertools
 
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from array import array
 
 from mynbt.bitpack import UINT_16
 from mynbt.region import Region
 from mynbt.section import Section, new_block_map, blit
 from mynbt.poi import POI
+from mynbt.cache import LRUCache
+from mynbt.manifest import Manifest
 from mynbt.nbt import parse_file
 
 # ====================================================================
@@ -28,6 +33,8 @@ def Locator(dirname):
         raids=lambda : os.path.join(dirname, 'data', 'raids.dat'),
         region=lambda rx, rz : os.path.join(dirname, 'region', 'r.{}.{}.mca'.format(rx,rz)),
         poi=lambda rx, rz : os.path.join(dirname, 'poi', 'r.{}.{}.mca'.format(rx,rz)),
+        region_files=lambda : glob.glob(os.path.join(dirname, 'region', 'r.*.*.mca')),
+        manifest=lambda : os.path.join(dirname, 'mynbt-manifest.sqlite'),
         players=lambda : glob.glob(os.path.join(dirname, '*.dat'))
     ))
 
@@ -80,51 +87,148 @@ def _partition(xrange):
     return result
 
 
+ApplyStats = namedtuple('ApplyStats', ['regions', 'chunks', 'sections'])
+
+def _apply_region(region, chunks, fct, args, kwargs):
+    """ Apply a function to the given chunks of a region.
+
+        Return the number of chunks and sections processed
+    """
+    n_sections = 0
+    for (cx, cz), sections in chunks.items():
+        with region.chunk[cx,cz] as chunk:
+            for cy, *span in sections:
+                section = chunk.section(cy)
+                fct(section, *span, *args, **kwargs)
+                n_sections += 1
+
+    return ApplyStats(1, len(chunks), n_sections)
+
+def _apply_region_file(dirname, rx, rz, chunks, fct, args, kwargs):
+    """ Worker process entry point for ChangeSet.apply
+    """
+    with World(dirname).region(rx, rz) as region:
+        return _apply_region(region, chunks, fct, args, kwargs)
+
+def _merge_stats(stats):
+    return ApplyStats(*(sum(values) for values in zip(*stats))) if stats else ApplyStats(0,0,0)
+
 # ====================================================================
 # ChangeSet
 # ====================================================================
 class ChangeSet:
     """ Cache region so region files are not written after every
         single changes
+
+        In streaming mode, regions are saved and released as soon
+        as `apply` has processed all their chunks. `max_regions` caps
+        the number of regions kept open at a time, the least recently
+        used ones being saved and released first.
+
+        If set, `progress` is called as `progress(done, total, (rx, rz))`
+        each time `apply` has processed a region.
+
+        Modified chunks are compressed when their region is saved, by
+        `compress_workers` threads (one per CPU by default).
     """
 
-    def __init__(self, world):
+    def __init__(self, world, *, chunk_cache=None, streaming=False, max_regions=None, progress=None, compress_workers=None):
         self._world = world
-        self._cache = {}
+        self._cache = OrderedDict()
+        self._chunk_cache = chunk_cache if chunk_cache is not None else LRUCache()
+        self._factory = Region.withCache(self._chunk_cache)
+        self._streaming = streaming
+        self._max_regions = max_regions
+        self._progress = progress
+        self._compress_workers = compress_workers
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        for region in self._cache.values():
-            region.__exit__(*args)
+        while self._cache:
+            self.release(*next(iter(self._cache)), *args)
 
     def region(self, rx, rz):
         try:
             result = self._cache[rx,rz]
+            self._cache.move_to_end((rx,rz))
         except KeyError:
-            result = self._cache[rx,rz] = self._world.region(rx,rz, factory=Region.withCache())
+            if self._max_regions is not None:
+                while len(self._cache) >= max(1, self._max_regions):
+                    self.release(*next(iter(self._cache)))
+
+            result = self._cache[rx,rz] = self._world.region(rx,rz, factory=self._factory)
+            result.defer_compression(self._compress_workers)
 
         return result
 
+    def release(self, rx, rz, exc_type=None, *args):
+        """ Save the region if it was modified, and drop it from
+            the change set along with its cached chunks
+        """
+        region = self._cache.pop((rx,rz), None)
+        if region is not None:
+            region.__exit__(exc_type, *args)
+            region.uncache()
+
+    @property
+    def chunk_cache(self):
+        """ The parsed chunk cache shared by all the regions of the change set
+        """
+        return self._chunk_cache
+
     #------------------------------------
     # World modifications
     #------------------------------------
-    def apply(self, fct, xrange, yrange, zrange, *args, **kwargs):
+    def apply(self, fct, xrange, yrange, zrange, *args, workers=None, **kwargs):
         """ Apply a function to an area of the world
+
+            If `workers` is set, regions are processed in parallel by
+            that many worker processes. Each worker opens, edits and saves
+            its region file on its own, so `fct` and its arguments must be
+            picklable. Return an `ApplyStats` tuple.
         """
-        for (rx, ry), chunks in partition(xrange, yrange, zrange).items():
-            with self.region(rx, ry) as region:
-                for (cx, cz), sections in chunks.items():
-                    with region.chunk[cx,cz] as chunk:
-                        for cy, *span in sections:
-                            section = chunk.section(cy)
-                            fct(section, *span, *args, **kwargs)
-
-    def fill(self, xrange, yrange, zrange, **block):
+        regions = partition(xrange, yrange, zrange)
+        if workers:
+            return self._parallel_apply(regions, workers, fct, args, kwargs)
+
+        stats = []
+        for done, ((rx, rz), chunks) in enumerate(regions.items(), 1):
+            with self.region(rx, rz) as region:
+                stats.append(_apply_region(region, chunks, fct, args, kwargs))
+
+            if self._streaming:
+                self.release(rx, rz)
+
+            if self._progress is not None:
+                self._progress(done, len(regions), (rx, rz))
+
+        return _merge_stats(stats)
+
+    def _parallel_apply(self, regions, workers, fct, args, kwargs):
+        # workers read and write the region files directly: pending
+        # changes must be saved first, and cached copies become stale
+        for rx, rz in regions:
+            self.release(rx, rz)
+
+        stats = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_apply_region_file, self._world._dirname, rx, rz, chunks, fct, args, kwargs): (rx, rz)
+                for (rx, rz), chunks in regions.items()
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                stats.append(future.result())
+                if self._progress is not None:
+                    self._progress(done, len(regions), futures[future])
+
+        return _merge_stats(stats)
+
+    def fill(self, xrange, yrange, zrange, *, workers=None, **block):
         """ Fill an area of the world
         """
-        self.apply(Section.fill, xrange, yrange, zrange, **block)
+        return self.apply(Section.fill, xrange, yrange, zrange, workers=workers, **block)
 
     def copy(self, xrange, yrange, zrange):
         """ Return a BlockMap containing a copy of world blocks
@@ -187,8 +291,25 @@ class World:
         """
         return World.fromSaveFolder(MINECRAFT_HOME, worldname)
 
-    def region(self, rx, rz, factory=None):
-        return Region.fromFile(rx, rz, self._locator.region(rx,rz), factory=factory)
+    def region(self, rx, rz, factory=None, *, lazy=False, cache=None):
+        """ Open a region. See Anvil.fromFile() for the `lazy` and `cache`
+            parameters
+        """
+        return Region.fromFile(rx, rz, self._locator.region(rx,rz), factory=factory, lazy=lazy, cache=cache)
+
+    def region_coords(self):
+        """ Return the sorted list of (rx, rz) positions of the region
+            files present in the world
+        """
+        result = []
+        for path in self._locator.region_files():
+            try:
+                _, rx, rz, _ = os.path.basename(path).split('.')
+                result.append((int(rx), int(rz)))
+            except ValueError:
+                pass
+
+        return sorted(result)
 
     def poi(self, rx, rz):
         return POI.fromFile(rx, rz, self._locator.region(rx,rz))
@@ -208,13 +329,44 @@ class World:
 
         return self.region(rx,rz).chunk[cx,cz]
 
-    def chunks(self, cx_range, cz_range):
+    def chunks(self, cx_range, cz_range, *, manifest=None):
         """ Iterator over the chunks in the range
 
-            Region are kept in cache during iteration
+            Region are kept in cache during iteration. If a manifest
+            is given, only the regions and chunks it reports as present
+            are visited. Otherwise missing region files and empty chunks
+            are skipped.
+        """
+        if manifest is not None:
+            positions = manifest.chunks(cx_range, cz_range)
+        else:
+            present = set(self.region_coords())
+            positions = [ (cx, cz) for cz in cz_range for cx in cx_range
+                          if (cx//32, cz//32) in present ]
+
+        key = region = None
+        for cx, cz in positions:
+            rx, x = divmod(cx, 32)
+            rz, z = divmod(cz, 32)
+            if key != (rx, rz):
+                key = (rx, rz)
+                region = self.region(rx, rz)
+
+            info = region.chunk_info(x, z)
+            if len(info.data):
+                yield region.chunk[x, z]
+
+    def manifest(self, *, path=None, extract=None, refresh=True):
+        """ Open the chunk manifest of the world, stored by default in
+            the world directory
+
+            See `mynbt.manifest.Manifest`
         """
+        result = Manifest(self, path or self._locator.manifest(), extract=extract)
+        if refresh:
+            result.refresh()
 
-        raise NotImplementedError
+        return result
 
     def block(self, x,y,z):
         """ Get the block at (x,y,z) in the world coordinate system.
@@ -232,6 +384,12 @@ class World:
     def editor(self):
         return ChangeSet(self)
 
+    def stream_editor(self, *, max_regions=1, progress=None):
+        """ Return a change set saving and releasing each region
+            once it has been processed
+        """
+        return ChangeSet(self, streaming=True, max_regions=max_regions, progress=progress)
+
     def players(self):
         """ Itertor over the player's data
         """
@@ -0,0 +1,72 @@
+import unittest
+import asyncio
+import threading
+import os.path
+from unittest import mock
+
+from mynbt.world import World
+from mynbt.region import Region
+from mynbt.aio import AsyncWorld
+
+MC_SAMPLE_WORLD=os.path.join('test','data','MC-1_14_4-World')
+
+class TestAsyncWorld(unittest.TestCase):
+    def test_1(self):
+        """ Blocks read asynchronously are the same as blocks read synchronously
+        """
+        world = World(MC_SAMPLE_WORLD)
+        positions = [ (x, 64, z) for x in (-20, 0, 5, 17) for z in (-3, 0, 40) ]
+
+        async def run():
+            async with AsyncWorld(MC_SAMPLE_WORLD) as aworld:
+                return await asyncio.gather(*(aworld.block(*pos) for pos in positions))
+
+        blocks = asyncio.run(run())
+        for pos, block in zip(positions, blocks):
+            self.assertEqual(block, world.block(*pos))
+
+    def test_2(self):
+        """ Concurrent requests for the same chunk are coalesced
+        """
+        async def run():
+            async with AsyncWorld(MC_SAMPLE_WORLD) as aworld:
+                chunks = await asyncio.gather(*(aworld.chunk(1, 2) for _ in range(10)))
+                again = await aworld.chunk(1, 2)
+                return aworld, chunks, again
+
+        aworld, chunks, again = asyncio.run(run())
+        for chunk in chunks:
+            self.assertIs(chunk, chunks[0])
+        self.assertIs(again, chunks[0])
+        self.assertEqual(aworld.cache.stats.count, 1)
+        self.assertEqual(len(aworld._regions), 1)
+
+    def test_3(self):
+        """ Errors are reported to all the waiting callers
+        """
+        async def run():
+            async with AsyncWorld(MC_SAMPLE_WORLD) as aworld:
+                return await asyncio.gather(*(aworld.chunk(1000, 1000) for _ in range(3)), return_exceptions=True)
+
+        for result in asyncio.run(run()):
+            self.assertIsInstance(result, FileNotFoundError)
+
+    def test_4(self):
+        """ Sections are decoded in the thread pool, not on the event loop
+        """
+        threads = []
+        section = Region.Chunk.section
+        def spy(chunk, *args, **kwargs):
+            threads.append(threading.get_ident())
+            return section(chunk, *args, **kwargs)
+
+        async def run():
+            async with AsyncWorld(MC_SAMPLE_WORLD) as aworld:
+                await aworld.block(5, 64, 5)
+                return threading.get_ident()
+
+        with mock.patch.object(Region.Chunk, 'section', spy):
+            loop_thread = asyncio.run(run())
+
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
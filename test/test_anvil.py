@@ -6,6 +6,7 @@ from mynbt.anvil import *
 from test.data.region import *
 from test.data.nbt import *
 import mynbt.nbt as nbt
+import mynbt.utils as utils
 import os.path
 import shutil
 
@@ -480,3 +481,246 @@ class TestAutoSave(unittest.TestCase):
         
         self.assertEqual(old_data, new_data)
 
+
+class TestOpenHeader(unittest.TestCase):
+    SOURCE=os.path.join('test','data','simplechunk-r.0.0.mca')
+    COPY=os.path.join('test','tmp','simplechunk-header-copy.mca')
+
+    def setUp(self):
+        shutil.copy(self.SOURCE, self.COPY)
+
+    def test_1(self):
+        """ Header-only regions report the same chunks as fully loaded ones
+        """
+        full = Anvil.fromFile(0,0,self.SOURCE)
+        lazy = Anvil.open_header(0,0,self.SOURCE)
+
+        self.assertEqual(lazy.present_chunks(), [(2,1)])
+        self.assertEqual(lazy.timestamp(2,1), full.chunk_info(2,1).timestamp)
+        self.assertEqual(lazy.bitmap(), full.bitmap())
+        self.assertIsNone(lazy._data[32+2])
+
+        self.assertEqual(bytes(lazy.chunk_info(2,1).data), bytes(full.chunk_info(2,1).data))
+        self.assertEqual(lazy.parse_chunk(2,1).export(), full.parse_chunk(2,1).export())
+
+    def test_2(self):
+        """ Header decoding is consistent with the per-entry decoding
+        """
+        with open(self.SOURCE, 'rb') as f:
+            header = f.read(2*PAGE_SIZE)
+
+        locations, timestamps = decode_header(header)
+        for i in range(1024):
+            self.assertEqual(locations[i], int.from_bytes(header[4*i:4*i+4], 'big'))
+            self.assertEqual(timestamps[i], int.from_bytes(header[PAGE_SIZE+4*i:PAGE_SIZE+4*i+4], 'big'))
+
+    def test_3(self):
+        """ Header-only regions load their chunks before being saved
+            over their backing file
+        """
+        with open(self.COPY, 'rb') as f:
+            old_data = f.read()
+
+        with Anvil.open_header(0,0,self.COPY) as region:
+            region.set_chunk_info(region.chunk_info(2,1)._replace(timestamp=1234))
+
+        region = Anvil.fromFile(0,0,self.COPY)
+        self.assertEqual(region.chunk_info(2,1).timestamp, 1234)
+        self.assertEqual(bytes(region.chunk_info(2,1).data), old_data[2*PAGE_SIZE:])
+
+class TestLazyFromFile(unittest.TestCase):
+    SOURCE=os.path.join('test','data','simplechunk-r.0.0.mca')
+
+    def test_1(self):
+        """ Lazy regions read chunk data on first access only
+        """
+        region = Anvil.fromFile(0,0,self.SOURCE, lazy=True)
+        self.assertIsNone(region._data[32+2])
+
+        data = region.chunk_info(2,1).data
+        self.assertEqual(bytes(data), bytes(Anvil.fromFile(0,0,self.SOURCE).chunk_info(2,1).data))
+        self.assertIs(region._data[32+2], data)
+
+    def test_2(self):
+        """ Chunk data of lazy regions can be kept in a bounded shared cache
+        """
+        from mynbt.cache import LRUCache
+        cache = LRUCache(max_size=PAGE_SIZE)
+
+        r1 = Anvil.fromFile(0,0,self.SOURCE, lazy=True, cache=cache)
+        r2 = Anvil.fromFile(0,0,self.SOURCE, lazy=True, cache=cache)
+        data = r1.chunk_info(2,1).data
+        self.assertIsNone(r1._data[32+2])
+        self.assertIs(r2.chunk_info(2,1).data, data)
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertLessEqual(cache.size, PAGE_SIZE)
+
+        r1.load()
+        self.assertIs(r1._data[32+2], data)
+
+class TestSafeSave(unittest.TestCase):
+    SOURCE=os.path.join('test','data','simplechunk-r.0.0.mca')
+    COPY=os.path.join('test','tmp','simplechunk-save-copy.mca')
+
+    def setUp(self):
+        shutil.copy(self.SOURCE, self.COPY)
+        with open(self.COPY, 'rb') as f:
+            self.data = f.read()
+
+    def test_1(self):
+        """ A failed save leaves the original file untouched
+        """
+        region = Anvil.fromFile(0,0,self.COPY)
+        region.kill_chunk(2,1)
+
+        def write_to(output, **kwargs):
+            output.write(b"garbage")
+            raise RuntimeError()
+        region.write_to = write_to
+
+        with self.assertRaises(RuntimeError):
+            region.save()
+
+        with open(self.COPY, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        leftovers = [ name for name in os.listdir(os.path.dirname(self.COPY)) if name.endswith('.tmp') ]
+        self.assertEqual(leftovers, [])
+
+    def test_2(self):
+        """ In-place saves only append the modified chunks
+        """
+        region = Anvil.fromFile(0,0,self.COPY)
+        region.set_chunk_data(5,6, region.chunk_info(2,1).data, timestamp=1234)
+        region.set_chunk_data(2,1, region.chunk_info(2,1).data, timestamp=4321)
+        region.save_in_place()
+
+        with open(self.COPY, 'rb') as f:
+            data = f.read()
+        # the previous chunk data are still in place
+        self.assertEqual(data[2*PAGE_SIZE:len(self.data)], self.data[2*PAGE_SIZE:])
+
+        reloaded = Anvil.fromFile(0,0,self.COPY)
+        self.assertEqual(reloaded.present_chunks(), [(2,1),(5,6)])
+        self.assertEqual(reloaded.timestamp(5,6), 1234)
+        self.assertEqual(reloaded.timestamp(2,1), 4321)
+        for x, z in reloaded.present_chunks():
+            length, _, data = parse_chunk_header(reloaded.chunk_info(x,z).data)
+            self.assertEqual(bytes(data[:length]), bytes(parse_chunk_header(region.chunk_info(x,z).data)[2][:length]))
+
+    def test_3(self):
+        """ In-place saves can be chained, even after a full save,
+            but not once the file was replaced by a third party
+        """
+        region = Anvil.fromFile(0,0,self.COPY)
+        region.set_chunk_data(5,6, region.chunk_info(2,1).data)
+        region.save_in_place()
+        region.kill_chunk(2,1)
+        region.save_in_place()
+
+        self.assertEqual(Anvil.fromFile(0,0,self.COPY).present_chunks(), [(5,6)])
+
+        region.save()
+        region.set_chunk_data(7,8, region.chunk_info(5,6).data, timestamp=5678)
+        region.save_in_place()
+
+        reloaded = Anvil.fromFile(0,0,self.COPY)
+        self.assertEqual(reloaded.present_chunks(), [(5,6),(7,8)])
+        self.assertEqual(reloaded.timestamp(7,8), 5678)
+        self.assertEqual(bytes(reloaded.chunk_info(5,6).data), bytes(region.chunk_info(5,6).data))
+
+        shutil.copy(self.SOURCE, self.COPY+".new")
+        os.replace(self.COPY+".new", self.COPY)
+        with self.assertRaises(StaleFileError):
+            region.save_in_place()
+
+    def test_4(self):
+        """ Saved regions are no longer modified
+        """
+        for lazy in (False, True):
+            shutil.copy(self.SOURCE, self.COPY)
+            with Anvil.fromFile(0,0,self.COPY, lazy=lazy) as region:
+                region.kill_chunk(2,1)
+                region.save()
+                identity = os.stat(self.COPY)
+
+            self.assertEqual(os.stat(self.COPY).st_ino, identity.st_ino)
+            self.assertEqual(Anvil.fromFile(0,0,self.COPY).present_chunks(), [])
+
+    def test_5(self):
+        """ Saving preserves the mode of existing files, and creates
+            new files according to the umask
+        """
+        os.chmod(self.COPY, 0o640)
+        region = Anvil.fromFile(0,0,self.COPY)
+        region.kill_chunk(2,1)
+        region.save()
+        self.assertEqual(os.stat(self.COPY).st_mode & 0o7777, 0o640)
+
+        path = self.COPY+".new"
+        if os.path.exists(path):
+            os.unlink(path)
+        umask = os.umask(0o027)
+        try:
+            with utils.atomic_open(path) as output:
+                region.write_to(output)
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(path).st_mode & 0o7777, 0o640)
+        os.unlink(path)
+
+class TestWriteTo(unittest.TestCase):
+    SOURCE=os.path.join('test','data','simplechunk-r.0.0.mca')
+    COPY=os.path.join('test','tmp','simplechunk-write-copy.mca')
+
+    def setUp(self):
+        self.region = Anvil.fromFile(0,0,self.SOURCE)
+        for x in range(5):
+            self.region.set_chunk_data(x, 7, self.region.chunk_info(2,1).data, timestamp=100+x)
+
+        self.expected = BytesIO()
+        self.region.write_to(self.expected)
+        self.expected = self.expected.getvalue()
+
+    def test_1(self):
+        """ Regions can be assembled in memory
+        """
+        self.assertEqual(self.region.file_size(), len(self.expected))
+
+        buffer = bytearray(len(self.expected)+10)
+        self.assertEqual(self.region.write_to(memoryview(buffer)), len(self.expected))
+        self.assertEqual(bytes(buffer[:len(self.expected)]), self.expected)
+
+        with self.assertRaises(ValueError):
+            self.region.write_to(memoryview(bytearray(10)))
+
+    def test_2(self):
+        """ Files are written with the same content using vectored I/O
+        """
+        for buffering in (0, -1):
+            with open(self.COPY, 'wb', buffering=buffering) as output:
+                output.write(b"")
+                self.region.write_to(output)
+
+            with open(self.COPY, 'rb') as f:
+                self.assertEqual(f.read(), self.expected)
+
+    def test_4(self):
+        """ Buffered writes before and after the region are kept in order
+        """
+        for buffering in (0, -1):
+            with open(self.COPY, 'wb', buffering=buffering) as output:
+                output.write(b"head")
+                self.assertEqual(self.region.write_to(output), len(self.expected))
+                self.assertEqual(output.tell(), 4+len(self.expected))
+                output.write(b"tail")
+
+            with open(self.COPY, 'rb') as f:
+                self.assertEqual(f.read(), b"head" + self.expected + b"tail")
+
+    def test_3(self):
+        """ The header is encoded as before
+        """
+        region = Anvil(0,0,self.expected)
+        self.assertEqual(region.present_chunks(), [(2,1)] + [(x,7) for x in range(5)])
+        self.assertEqual([ region.timestamp(x,7) for x in range(5) ], [100,101,102,103,104])
+        self.assertEqual(len(self.expected) % PAGE_SIZE, 0)
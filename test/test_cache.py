@@ -0,0 +1,72 @@
+import unittest
+
+from mynbt.cache import *
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUCache(max_size=10)
+
+    def test_1(self):
+        """ Cache returns stored values and tracks hits and misses
+        """
+        self.cache.put("a", 1, 4)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+
+        stats = self.cache.stats
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+        self.assertEqual((stats.count, stats.size), (1, 4))
+
+    def test_2(self):
+        """ Least recently used items are evicted first
+        """
+        self.cache.put("a", 1, 4)
+        self.cache.put("b", 2, 4)
+        self.cache.get("a")
+        self.cache.put("c", 3, 4)
+
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertIn("c", self.cache)
+        self.assertEqual(self.cache.size, 8)
+        self.assertEqual(self.cache.stats.evictions, 1)
+
+    def test_3(self):
+        """ Replacing an item updates the cache size
+        """
+        self.cache.put("a", 1, 4)
+        self.cache.put("a", 2, 6)
+        self.assertEqual(self.cache.size, 6)
+        self.assertEqual(self.cache.get("a"), 2)
+
+    def test_4(self):
+        """ Items can be discarded by predicate
+        """
+        for key in (("r1", 0), ("r1", 1), ("r2", 0)):
+            self.cache.put(key, None, 1)
+
+        self.cache.discard_if(lambda key: key[0] == "r1")
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.stats.invalidations, 2)
+
+    def test_5(self):
+        """ Peeking does not change the statistics nor the eviction order
+        """
+        self.cache.put("a", 1, 4)
+        self.cache.put("b", 2, 4)
+        self.assertEqual(self.cache.peek("a"), 1)
+        self.cache.put("c", 3, 4)
+
+        self.assertNotIn("a", self.cache)
+        self.assertEqual((self.cache.stats.hits, self.cache.stats.misses), (0, 0))
+
+    def test_6(self):
+        """ Clearing the cache reports invalidations
+        """
+        self.cache.put("a", 1, 4)
+        self.cache.put("b", 2, 4)
+        self.cache.clear()
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+        self.assertEqual(self.cache.stats.invalidations, 2)
@@ -0,0 +1,94 @@
+import unittest
+import os.path
+import zlib
+
+from mynbt.codec import *
+from mynbt.codec import LZ4BLOCK_HEADER, LZ4BLOCK_MAGIC, LZ4BLOCK_RAW, lz4_block
+from mynbt.anvil import Anvil, parse_chunk_header
+
+SIMPLE_CHUNK=os.path.join('test','data','simplechunk-r.0.0.mca')
+
+def raw_lz4_stream(*blocks):
+    """ Build an lz4-java block stream made of uncompressed blocks
+    """
+    result = b""
+    for block in blocks:
+        result += LZ4BLOCK_HEADER.pack(LZ4BLOCK_MAGIC, LZ4BLOCK_RAW|6, len(block), len(block), 0) + block
+
+    return result + LZ4BLOCK_HEADER.pack(LZ4BLOCK_MAGIC, LZ4BLOCK_RAW|6, 0, 0, 0)
+
+class TestCodecs(unittest.TestCase):
+    DATA = bytes(range(256))*64
+
+    def test_1(self):
+        """ Built-in codecs round trip at any level
+        """
+        for code in (NONE, GLIB, ZLIB):
+            for level in (None, 0, 1, 9):
+                c = codec(code)
+                self.assertEqual(c.decompress(c.compress(self.DATA, level)), self.DATA)
+
+    def test_2(self):
+        """ Compression levels are honored
+        """
+        c = codec(ZLIB)
+        self.assertEqual(c.compress(self.DATA, 1), zlib.compress(self.DATA, 1))
+        self.assertGreater(len(c.compress(self.DATA, 0)), len(c.compress(self.DATA, 9)))
+
+    def test_3(self):
+        """ Decompression ignores padding after the compressed stream
+        """
+        c = codec(ZLIB)
+        data = memoryview(c.compress(self.DATA) + bytes(100))
+        self.assertEqual(c.decompress(data), self.DATA)
+
+    def test_6(self):
+        """ Truncated zlib and gzip streams are rejected
+        """
+        region = Anvil.fromFile(0,0,SIMPLE_CHUNK)
+        length, decompressor, data = region.parse_chunk_header(region.chunk_info(2,1))
+        chunk = decompressor(data)
+
+        for code in (ZLIB, GLIB):
+            c = codec(code)
+            stream = c.compress(chunk)
+            with self.assertRaises(zlib.error):
+                c.decompress(stream[:len(stream)//2])
+            with self.assertRaises(zlib.error):
+                c.decompress(memoryview(stream)[:-1])
+
+    def test_4(self):
+        """ LZ4 block streams with raw blocks can be decoded
+        """
+        self.assertEqual(codec(LZ4).decompress(raw_lz4_stream(b"abc", b"defg")), b"abcdefg")
+        with self.assertRaises(CodecError):
+            codec(LZ4).decompress(b"LZ4Blocx"+bytes(13))
+
+    @unittest.skipIf(lz4_block is None, "lz4 not available")
+    def test_5(self):
+        """ LZ4 round trip
+        """
+        c = codec(LZ4)
+        self.assertEqual(c.decompress(c.compress(self.DATA)), self.DATA)
+
+class TestWriteChunk(unittest.TestCase):
+    def test_1(self):
+        """ write_chunk can select the compression codec and level
+        """
+        region = Anvil.fromFile(0,0,SIMPLE_CHUNK)
+        nbt = region.parse_chunk(2,1)
+        expected = None
+
+        sizes = {}
+        for compression, level in ((ZLIB, 1), (ZLIB, 9), (GLIB, None), (NONE, None)):
+            ci = region.write_chunk(2,1,nbt, compression=compression, level=level)
+            length, code, data = parse_chunk_header(ci.data)
+            self.assertEqual(bytes(code), compression)
+
+            payload = codec(compression).decompress(data[:length])
+            expected = expected or payload
+            self.assertEqual(payload, expected)
+            sizes[compression, level] = length
+
+        self.assertLess(sizes[ZLIB, 9], sizes[NONE, None])
+        self.assertLessEqual(sizes[ZLIB, 9], sizes[ZLIB, 1])
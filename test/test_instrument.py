@@ -0,0 +1,73 @@
+import unittest
+import io
+import json
+
+from mynbt import instrument
+from mynbt.instrument import Recorder, recording
+from mynbt.nbt import parse
+from mynbt.codec import codec, ZLIB
+from mynbt import bitpack
+
+from test.data.nbt import *
+
+class TestRecorder(unittest.TestCase):
+    def test_1(self):
+        """ Stages are not recorded outside of a recording block
+        """
+        self.assertIsNone(instrument.RECORDER)
+        parse(SOME_COMPOUND.BYTES)
+
+        with recording() as recorder:
+            self.assertIs(instrument.RECORDER, recorder)
+
+        self.assertIsNone(instrument.RECORDER)
+        self.assertEqual(recorder.report(), {})
+
+    def test_2(self):
+        """ Recorded stages report their calls and bytes
+        """
+        data = bytes(SOME_NESTED_COMPOUND.BYTES)
+        with recording() as recorder:
+            parse(data)
+            parse(data)
+            compressed = codec(ZLIB).compress(data)
+            codec(ZLIB).decompress(compressed)
+            bitpack.unpack(4, 8, b"\x12\x34")
+
+        report = recorder.report()
+        self.assertEqual(report['nbt.parse']['calls'], 2)
+        self.assertEqual(report['nbt.parse']['bytes'], 2*len(data))
+        self.assertEqual(report['zlib.compress']['bytes'], len(data))
+        self.assertEqual(report['zlib.decompress']['bytes'], len(data))
+        self.assertEqual(report['bitpack.unpack']['calls'], 1)
+        self.assertGreaterEqual(report['nbt.parse']['seconds'], 0)
+
+    def test_3(self):
+        """ Recordings can be nested and reused
+        """
+        outer = Recorder()
+        with recording(outer):
+            with recording() as inner:
+                parse(SOME_COMPOUND.BYTES)
+            self.assertIs(instrument.RECORDER, outer)
+            parse(SOME_COMPOUND.BYTES)
+
+        with recording(outer):
+            parse(SOME_COMPOUND.BYTES)
+
+        self.assertEqual(inner.report()['nbt.parse']['calls'], 1)
+        self.assertEqual(outer.report()['nbt.parse']['calls'], 2)
+
+    def test_4(self):
+        """ Reports can be dumped as JSON
+        """
+        with recording() as recorder:
+            parse(SOME_COMPOUND.BYTES)
+
+        output = io.StringIO()
+        recorder.dump(output)
+        self.assertEqual(json.loads(output.getvalue()), recorder.report())
+        self.assertEqual(json.loads(recorder.to_json()), recorder.report())
+
+        recorder.clear()
+        self.assertEqual(recorder.report(), {})
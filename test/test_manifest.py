@@ -0,0 +1,111 @@
+import unittest
+import os
+import os.path
+import shutil
+import warnings
+
+from mynbt.world import World
+from mynbt.manifest import scan_region_file, chunk_bitmap
+
+MC_SAMPLE_WORLD=os.path.join('test','data','MC-1_14_4-World')
+MC_COPY_WORLD=os.path.join('test','tmp','manifest-World')
+SIMPLE_CHUNK=os.path.join('test','data','simplechunk-r.0.0.mca')
+SIMPLE_WORLD=os.path.join('test','tmp','manifest-simple-World')
+
+class TestScan(unittest.TestCase):
+    def test_1(self):
+        """ Scanning a region file reports its chunks from the header
+        """
+        chunks = list(scan_region_file(SIMPLE_CHUNK))
+        self.assertEqual(len(chunks), 1)
+        x, z, addr, sectors, timestamp, length, compression = chunks[0]
+        self.assertEqual((x, z), (2, 1))
+        self.assertEqual(compression, 2)
+        self.assertLessEqual(length, sectors*4096)
+
+    def test_2(self):
+        """ Presence bitmaps have one bit per chunk
+        """
+        bitmap = chunk_bitmap([(0,0), (9,0), (31,31)])
+        self.assertEqual(len(bitmap), 128)
+        self.assertEqual(bitmap[0], 1)
+        self.assertEqual(bitmap[1], 2)
+        self.assertEqual(bitmap[127], 0x80)
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        shutil.rmtree(MC_COPY_WORLD, ignore_errors=True)
+        shutil.copytree(os.path.join(MC_SAMPLE_WORLD, 'region'), os.path.join(MC_COPY_WORLD, 'region'))
+        self.world = World(MC_COPY_WORLD)
+
+    def test_1(self):
+        """ The manifest reports the same chunks as the region files
+        """
+        with self.world.manifest() as manifest:
+            self.assertEqual(manifest.regions(), self.world.region_coords())
+            for rx, rz in self.world.region_coords():
+                region = self.world.region(rx, rz)
+                expected = sorted((rx*32+x, rz*32+z) for x in range(32) for z in range(32)
+                                  if len(region.chunk_info(x, z).data))
+                actual = sorted(manifest.chunks(range(rx*32, rx*32+32), range(rz*32, rz*32+32)))
+                self.assertEqual(actual, expected)
+
+    def test_2(self):
+        """ Regions are rescanned only when their file changed
+        """
+        with self.world.manifest() as manifest:
+            self.assertEqual(manifest.refresh(), [])
+
+            path = os.path.join(MC_COPY_WORLD, 'region', 'r.0.0.mca')
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns+1000000000))
+            self.assertEqual(manifest.refresh(), [(0,0)])
+
+            os.unlink(path)
+            self.assertEqual(manifest.refresh(), [])
+            self.assertNotIn((0,0), manifest.regions())
+            self.assertEqual(manifest.chunks(range(0,32), range(0,32)), [])
+
+    def test_3(self):
+        """ The manifest persists in the world directory
+        """
+        self.world.manifest().close()
+        self.assertTrue(os.path.exists(os.path.join(MC_COPY_WORLD, 'mynbt-manifest.sqlite')))
+
+        with self.world.manifest(refresh=False) as manifest:
+            self.assertEqual(manifest.regions(), self.world.region_coords())
+
+    def test_4(self):
+        """ World.chunks only visits the chunks listed in the manifest
+        """
+        cx_range, cz_range = range(-4, 4), range(-4, 4)
+        with self.world.manifest() as manifest:
+            expected = [ (chunk.x, chunk.z) for chunk in self.world.chunks(cx_range, cz_range) ]
+            actual = [ (chunk.x, chunk.z) for chunk in self.world.chunks(cx_range, cz_range, manifest=manifest) ]
+
+        self.assertEqual(sorted(actual), sorted(expected))
+        self.assertEqual(len(actual), 64)
+
+class TestManifestKeys(unittest.TestCase):
+    def setUp(self):
+        shutil.rmtree(SIMPLE_WORLD, ignore_errors=True)
+        os.makedirs(os.path.join(SIMPLE_WORLD, 'region'))
+        shutil.copy(SIMPLE_CHUNK, os.path.join(SIMPLE_WORLD, 'region', 'r.1.0.mca'))
+        self.world = World(SIMPLE_WORLD)
+
+    def test_1(self):
+        """ Extracted keys can be queried
+        """
+        def extract(chunk):
+            yield ("Status", str(chunk.nbt['Level']['Status']))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            manifest = self.world.manifest(extract=extract)
+
+        with manifest:
+            self.assertEqual(manifest.find("Status"), [(34, 1)])
+            self.assertEqual(manifest.find("Status", "full"), [(34, 1)])
+            self.assertEqual(manifest.find("Status", "empty"), [])
+            self.assertEqual(manifest.chunk(34, 1)['compression'], 2)
+            self.assertEqual(manifest.bitmap(1, 0)[(32*1+2) >> 3], 1 << ((32*1+2) & 7))
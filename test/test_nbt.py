@@ -4,6 +4,7 @@ import os.path
 import array
 
 from mynbt.nbt import *
+from mynbt.anvil import Anvil
 from test.data.nbt import *
 from pprint import pprint
 
@@ -131,6 +132,26 @@ class TestParsing(unittest.TestCase):
         self.assertEqual(name, "shortTest")
         self.assertEqual(offset, 1+2+len(name))
 
+    def test_parse_header(self):
+        """ The fused header decode matches parse_id + parse_name
+        """
+        data = SOME_SHORT.BYTES
+        trait, name, offset = parse_header(memoryview(data), 0)
+
+        self.assertIs(trait, ShortTrait)
+        self.assertEqual(name, "shortTest")
+        self.assertEqual(offset, 1+2+len(name))
+
+        self.assertEqual(parse_header(memoryview(b"\x00"), 0), (EndTrait, None, 1))
+
+    def test_trait_struct(self):
+        """ Traits with a FORMAT have a matching precompiled Struct
+        """
+        for trait in (ByteTrait, ShortTrait, IntTrait, LongTrait, FloatTrait, DoubleTrait,
+                      ByteArrayTrait, IntArrayTrait, LongArrayTrait):
+            self.assertEqual(trait.STRUCT.format, trait.FORMAT)
+            self.assertEqual(trait.STRUCT.size, trait.SIZE)
+
     def test_Short(self):
         reader = AtomReader(ShortTrait)
         data = SOME_SHORT.BYTES
@@ -832,3 +853,127 @@ class TestClone(unittest.TestCase):
 
         self.assertEqual(clone.data['value'], 456)
         self.assertEqual(self.nbt.data['value'], 123)
+
+class TestZeroCopy(unittest.TestCase):
+    def source(self):
+        region = Anvil.fromFile(0,0,os.path.join('test','data','simplechunk-r.0.0.mca'))
+        length, decompressor, data = region.parse_chunk_header(region.chunk_info(2,1))
+        return decompressor(data)
+
+    def test_1(self):
+        """ Unmodified trees are written back as a single slice of their source
+        """
+        source = self.source()
+        tree, name, offset = parse(source)
+
+        writes = []
+        class Output:
+            def write(self, data):
+                writes.append(data)
+
+        tree.write_to(Output(), name)
+        self.assertEqual(len(writes), 1)
+        self.assertIsInstance(writes[0], memoryview)
+        self.assertIs(writes[0].obj, source)
+        self.assertEqual(bytes(writes[0]), source)
+        self.assertEqual(bytes(tree.dump(name)), source)
+
+    def test_2(self):
+        """ Modified trees, or trees written with another name, are serialized
+        """
+        source = self.source()
+        tree, name, offset = parse(source)
+
+        renamed = tree.dump("other")
+        self.assertNotEqual(bytes(renamed), source)
+        self.assertEqual(parse(renamed)[1], "other")
+
+        tree.Level.InhabitedTime = 42
+        modified = tree.dump(name)
+        self.assertEqual(len(modified), len(source))
+        self.assertNotEqual(bytes(modified), source)
+        self.assertEqual(parse(modified)[0].Level.InhabitedTime, 42)
+
+class TestNative(unittest.TestCase):
+    def source(self):
+        region = Anvil.fromFile(0,0,os.path.join('test','data','simplechunk-r.0.0.mca'))
+        length, decompressor, data = region.parse_chunk_header(region.chunk_info(2,1))
+        return bytes(decompressor(data))
+
+    def test_1(self):
+        """ Native loading gives the same values as export()
+        """
+        for data in (SOME_SHORT, SOME_COMPOUND, SOME_NESTED_COMPOUND, SOME_LIST):
+            value = loads(data.BYTES)
+            self.assertEqual(value, parse(data.BYTES)[0].export())
+            self.assertNotIsInstance(value, Node)
+
+    def test_2(self):
+        """ Native loading decodes arrays as array.array
+        """
+        source = self.source()
+        value = loads(source)
+        self.assertEqual(type(value['Level']['xPos']), int)
+        self.assertIsInstance(value['Level']['Heightmaps']['WORLD_SURFACE'], array)
+
+        tree = parse(source)[0]
+        self.assertEqual(list(value['Level']['Heightmaps']['WORLD_SURFACE']),
+                         list(tree.Level.Heightmaps.WORLD_SURFACE))
+        self.assertEqual(value['Level']['Status'], tree.Level.Status)
+
+    def test_3(self):
+        """ Native values are written back identically using their schema
+        """
+        source = self.source()
+        self.assertEqual(dumps(loads(source), schema=loads(source, mode='schema')), source)
+
+        for data in (SOME_COMPOUND, SOME_NESTED_COMPOUND, SOME_LIST):
+            name = parse(data.BYTES)[1]
+            self.assertEqual(dumps(loads(data.BYTES), name, schema=loads(data.BYTES, mode='schema')), bytes(data.BYTES))
+
+    def test_4(self):
+        """ Without schema, the NBT types are infered from the Python types
+        """
+        obj = { 'b': True, 'i': 1, 'l': 2**40, 'd': 1.5, 's': "abc",
+                'a': array('b', [1,2]), 'L': [1, 2**40], 'C': [{}, {}], 'E': [] }
+        tree = parse(dumps(obj))[0]
+        self.assertIs(tree._get('b')._trait, ByteTrait)
+        self.assertIs(tree._get('i')._trait, IntTrait)
+        self.assertIs(tree._get('l')._trait, LongTrait)
+        self.assertIs(tree._get('d')._trait, DoubleTrait)
+        self.assertIs(tree._get('a')._trait, ByteArrayTrait)
+        self.assertIs(tree._get('L')._child_trait, LongTrait)
+        self.assertIs(tree._get('C')._child_trait, CompoundTrait)
+        self.assertIs(tree._get('E')._child_trait, EndTrait)
+
+        obj = { 'x': 1, 'Items': [ { 'n': 1 }, { 'n': 2 } ] }
+        schema = { 'x': ShortTrait, 'Items': [ { 'n': ByteTrait } ] }
+        data = dumps(obj, schema=schema)
+        self.assertEqual(loads(data, mode='schema'), schema)
+        self.assertEqual(loads(data), obj)
+
+    def test_5(self):
+        """ List items using different types get one schema each
+        """
+        obj = { 'Items': [ { 'n': 1 }, { 'n': 2 } ] }
+        schema = { 'Items': [ { 'n': ByteTrait }, { 'n': ShortTrait } ] }
+        data = dumps(obj, schema=schema)
+        self.assertEqual(loads(data, mode='schema'), schema)
+
+        with self.assertRaises(ValueError):
+            loads(data, mode='other')
+
+    def test_6(self):
+        """ Empty lists keep their item type
+        """
+        obj = { 'I': [], 'C': [], 'L': [], 'E': [], 'N': [[], [1]] }
+        schema = { 'I': [IntTrait], 'C': [{}], 'L': [[EndTrait]], 'E': [EndTrait], 'N': [[ShortTrait]] }
+        data = dumps(obj, schema=schema)
+        tree = parse(data)[0]
+        self.assertIs(tree._get('I')._child_trait, IntTrait)
+        self.assertIs(tree._get('C')._child_trait, CompoundTrait)
+        self.assertIs(tree._get('L')._child_trait, ListTrait)
+        self.assertIs(tree._get('E')._child_trait, EndTrait)
+
+        self.assertEqual(loads(data, mode='schema'), schema)
+        self.assertEqual(dumps(loads(data), schema=loads(data, mode='schema')), data)
@@ -1,5 +1,6 @@
 import unittest
 import os.path
+import io
 
 from mynbt.region import *
 from test.data.region import *
@@ -71,6 +72,151 @@ class TestRegion(unittest.TestCase):
         self.assertEqual(nbt.Level.Entities[0].Pos[0], 16*32*self.RX + 16*self.C2X + 11)
         self.assertEqual(nbt.Level.Entities[0].Pos[2], 16*32*self.RZ + 16*self.C2Z + 7)
 
+    def test_3(self):
+        """ Cached regions share their cache without mixing up chunks
+        """
+        factory = Region.withCache()
+        region1 = factory(self.RX, self.RZ, self.R, name="r1")
+        region2 = factory(self.RX, self.RZ, self.R, name="r2")
+
+        nbt1 = region1.chunk[self.C1X,self.C1Z].nbt
+        self.assertIs(region1.chunk[self.C1X,self.C1Z].nbt, nbt1)
+        self.assertIsNot(region2.chunk[self.C1X,self.C1Z].nbt, nbt1)
+        self.assertEqual(factory.cache.stats.hits, 1)
+
+    def test_4(self):
+        """ Cached chunks are invalidated when modified or replaced
+        """
+        region = Region.withCache()(self.RX, self.RZ, self.R, name="r")
+
+        nbt = region.chunk[self.C1X,self.C1Z].nbt
+        nbt.n = "modified"
+        self.assertEqual(region.chunk[self.C1X,self.C1Z].nbt.n, "Chunk 1,2")
+
+        region.kill_chunk(self.C2X,self.C2Z)
+        region.copy_chunk(self.C1X,self.C1Z, self.C2X,self.C2Z)
+        nbt = region.chunk[self.C2X,self.C2Z].nbt
+        self.assertEqual(nbt.n, "Chunk 1,2")
+        self.assertEqual(nbt.Level.xPos, 32*self.RX+self.C2X)
+
+    def test_5(self):
+        """ Writing a chunk back does not count as a cache hit
+        """
+        factory = Region.withCache()
+        region = factory(self.RX, self.RZ, self.R, name="r")
+
+        with region.chunk[self.C1X,self.C1Z] as chunk:
+            chunk.nbt.n = "modified"
+
+        stats = factory.cache.stats
+        self.assertEqual((stats.hits, stats.misses), (0, 1))
+        self.assertEqual(region.chunk[self.C1X,self.C1Z].nbt.n, "modified")
+        self.assertEqual(factory.cache.stats.hits, 1)
+
+    def test_6(self):
+        """ Unnamed regions are cached, but never share their entries
+        """
+        factory = Region.withCache()
+        region1 = factory(self.RX, self.RZ, self.R)
+        region2 = factory(self.RX, self.RZ, self.R)
+
+        nbt1 = region1.chunk[self.C1X,self.C1Z].nbt
+        self.assertIs(region1.chunk[self.C1X,self.C1Z].nbt, nbt1)
+        self.assertIsNot(region2.chunk[self.C1X,self.C1Z].nbt, nbt1)
+        self.assertEqual(len(factory.cache), 2)
+
+        region1.uncache()
+        self.assertEqual(len(factory.cache), 1)
+
+    def test_7(self):
+        """ Chunks copied to their own position are not recompressed
+        """
+        source = Region(self.RX, self.RZ, self.R)
+        data = source.chunk_info(self.C1X,self.C1Z).data
+
+        self.region.kill_chunk(self.C1X,self.C1Z)
+        self.region.chunk[self.C1X,self.C1Z] = source.chunk[self.C1X,self.C1Z]
+        self.assertIs(self.region.chunk_info(self.C1X,self.C1Z).data, data)
+
+class TestRelocation(unittest.TestCase):
+    def payload(self, region, x, z):
+        length, decompressor, data = region.parse_chunk_header(region.chunk_info(x, z))
+        return decompressor(data)
+
+    def test_1(self):
+        """ Chunks relocated in place are identical to chunks
+            relocated by rewriting their NBT tree
+        """
+        region = Region.fromFile(0,0,FILE['simplechunk.mca'])
+        expected = Region.fromFile(0,0,FILE['simplechunk.mca'])
+
+        region.copy_chunk(2,1, 5,7)
+        expected.write_chunk(5,7, expected.parse_chunk(2,1))
+
+        self.assertEqual(self.payload(region, 5,7), self.payload(expected, 5,7))
+        self.assertEqual(self.payload(region, 2,1), self.payload(expected, 2,1))
+
+        nbt = region.parse_chunk(5,7)
+        self.assertEqual((nbt.Level.xPos, nbt.Level.zPos), (5,7))
+
+    def test_2(self):
+        """ The source chunk is left untouched by a relocation
+        """
+        region = Region.fromFile(0,0,FILE['simplechunk.mca'])
+        data = bytes(region.chunk_info(2,1).data)
+
+        region.copy_chunk(2,1, 5,7)
+        self.assertEqual(bytes(region.chunk_info(2,1).data), data)
+
+class TestDeferredCompression(unittest.TestCase):
+    def write(self, region):
+        nbt = region.parse_chunk(2,1)
+        for x in range(8):
+            region.write_chunk(x, 3, nbt, timestamp=1000+x)
+
+        output = io.BytesIO()
+        region.write_to(output)
+        return output.getvalue()
+
+    def test_1(self):
+        """ Deferred compression produces the same output as
+            the synchronous compression
+        """
+        expected = self.write(Region.fromFile(0,0,FILE['simplechunk.mca']))
+
+        region = Region.fromFile(0,0,FILE['simplechunk.mca'])
+        region.defer_compression(4)
+        self.assertEqual(self.write(region), expected)
+        self.assertEqual(region._pending, {})
+
+    def test_2(self):
+        """ Deferred chunks are compressed on access
+        """
+        region = Region.fromFile(0,0,FILE['simplechunk.mca'])
+        region.defer_compression(4)
+        ci = region.write_chunk(5, 5, region.parse_chunk(2,1))
+        self.assertIsNone(ci.data)
+        self.assertIn((5,5), region.present_chunks())
+
+        nbt = region.parse_chunk(5,5)
+        self.assertEqual((nbt.Level.xPos, nbt.Level.zPos), (5,5))
+        self.assertEqual(len(region._pending), 0)
+
+    def test_3(self):
+        """ Cached trees written with deferred compression are
+            fingerprinted once compressed
+        """
+        factory = Region.withCache()
+        region = factory.fromFile(0,0,FILE['simplechunk.mca'], factory=factory)
+        region.defer_compression(2)
+
+        with region.chunk[2,1] as chunk:
+            chunk.nbt.Level.InhabitedTime = 42
+
+        nbt = region.chunk[2,1].nbt
+        self.assertEqual(nbt.Level.InhabitedTime, 42)
+        self.assertEqual(factory.cache.stats.hits, 1)
+
 class TestAccessors(unittest.TestCase):
     def setUp(self):
         self.region = Region.fromFile(0,0,FILE['simplechunk.mca'])
@@ -89,3 +235,77 @@ class TestAccessors(unittest.TestCase):
         N=3
         section = self.chunk.section(N)
         self.assertEqual(section.y, N)
+
+    def test_3(self):
+        """ Sections are decoded only once
+        """
+        N=3
+        section = self.chunk.section(N)
+        self.assertIs(self.chunk.section(N), section)
+        self.assertIn(section, list(self.chunk.sections()))
+
+    def test_4(self):
+        """ Missing sections are created on demand
+        """
+        section = self.chunk.section(15)
+        self.assertEqual(section.y, 15)
+        self.assertEqual(section.block(0,0,0), dict(Name="minecraft:air"))
+        self.assertIs(self.chunk.section(15), section)
+
+    def test_5(self):
+        """ Section index follows changes of the section list
+        """
+        N=3
+        self.chunk.section(N)
+        sections = self.nbt.Level.Sections
+        del sections[[int(s['Y']) for s in sections].index(N)]
+
+        self.assertNotIn(N, [section.y for section in self.chunk.sections()])
+
+    def test_6(self):
+        """ Modified sections are repacked when the chunk is written
+        """
+        x, z = self.chunk.x, self.chunk.z
+        blk = dict(Name="minecraft:diamond_block")
+        section = self.chunk.section(3)
+        for n in range(20):
+            section[n%16, n//16, 0] = dict(Name="minecraft:wool_{}".format(n))
+        section.fill(range(0,2), range(0,16), range(0,16), **blk)
+        self.chunk.write(self.chunk.nbt)
+
+        chunk = self.region.chunk[x,z]
+        section = chunk.section(3)
+        self.assertEqual(section.block(1,5,7), blk)
+        self.assertEqual(section.block(4,0,0), dict(Name="minecraft:wool_4"))
+        self.assertEqual(section.block(3,1,0), dict(Name="minecraft:wool_19"))
+
+    def test_7(self):
+        """ Clean sections keep their original payload
+        """
+        x, z = self.chunk.x, self.chunk.z
+        before = bytes(self.chunk.section(2)._nbt['BlockStates']._payload)
+        self.chunk.section(3).fill(Name="minecraft:stone")
+        self.chunk.write(self.chunk.nbt)
+
+        self.assertIsNotNone(self.chunk.section(2)._nbt['BlockStates']._payload)
+        nbt = self.region.chunk[x,z].nbt
+        after = [s for s in nbt.Level.Sections if s['Y'] == 2][0]['BlockStates']
+        self.assertEqual(bytes(after._payload), before)
+
+    def test_8(self):
+        """ Empty sections can be skipped without being decoded
+        """
+        all_sections = [section.y for section in self.chunk.sections()]
+
+        # a fresh chunk, with no section decoded yet
+        chunk = next(Region.fromFile(0,0,FILE['simplechunk.mca']).chunks())
+        visited = []
+        def filter(nbt):
+            visited.append(int(nbt['Y']))
+            return True
+
+        non_empty = [section.y for section in chunk.sections(filter, non_empty=True)]
+        self.assertEqual(visited, non_empty)
+        self.assertLess(len(non_empty), len(all_sections))
+        for y in set(all_sections) - set(non_empty):
+            self.assertEqual(chunk.section(y).block(3,4,5), dict(Name="minecraft:air"))
@@ -22,6 +22,17 @@ class TestUtils(unittest.TestCase):
             self.assertEqual(v, idx2pos(k))
 
 
+    def test_3(self):
+        """ uniform_block_state classifies sections from their palette
+        """
+        uniform = nbt.Node.fromNativeObject(dict(Y=1, Palette=[dict(Name="minecraft:stone")]))
+        light_only = nbt.Node.fromNativeObject(dict(Y=-1))
+        mixed = nbt.Node.fromNativeObject(SECTION)
+
+        self.assertEqual(uniform_block_state(uniform), dict(Name="minecraft:stone"))
+        self.assertTrue(is_air(uniform_block_state(light_only)))
+        self.assertIsNone(uniform_block_state(mixed))
+
 class TestSection(unittest.TestCase):
     def setUp(self):
         self.section = Section.fromNBT(0,0,nbt.Node.fromNativeObject(SECTION))
@@ -72,6 +83,81 @@ class TestSection(unittest.TestCase):
                     self.assertEqual(self.section.block(x,y,z)['Name'], "minecraft:dirt")
 
 
+    def test_5(self):
+        """ Unused palette entries are dropped when repacking
+        """
+        self.section.fill(Name="minecraft:dirt")
+        self.section.fill(range(0,16), range(0,16), range(0,8), Name="minecraft:glass")
+        self.section.fill(range(0,16), range(0,16), range(8,16), Name="minecraft:stone")
+
+        section = self.section.toNBT()
+        self.assertEqual(section['Palette'], [dict(Name="minecraft:glass"), dict(Name="minecraft:stone")])
+        self.assertEqual(len(section['BlockStates']), 16*16*16*4//64)
+        self.assertEqual(self.section.block(3,4,5), dict(Name="minecraft:glass"))
+        self.assertEqual(self.section.block(3,4,12), dict(Name="minecraft:stone"))
+
+    def test_6(self):
+        """ Filling the whole section resets the palette
+        """
+        self.section.fill(Name="minecraft:dirt")
+        self.assertEqual(self.section.palette, [dict(Name="minecraft:dirt")])
+        self.assertEqual(set(self.section.blocks), {0})
+        self.assertTrue(self.section.dirty)
+
+    def test_7(self):
+        """ Sections can fill whole planes
+        """
+        self.section.fill(range(0,16), range(3,5), range(0,16), Name="minecraft:dirt")
+        for y in range(16):
+            self.assertEqual(self.section.block(0,y,0)['Name'] == "minecraft:dirt", 3 <= y < 5)
+            self.assertEqual(self.section.block(15,y,15)['Name'] == "minecraft:dirt", 3 <= y < 5)
+
+class TestCompactSection(unittest.TestCase):
+    def setUp(self):
+        self.reference = Section.fromNBT(0,0,nbt.Node.fromNativeObject(SECTION))
+        self.section = CompactSection.fromNBT(0,0,nbt.Node.fromNativeObject(SECTION))
+
+    def test_1(self):
+        """ Compact sections answer block lookups without expanding
+        """
+        for idx in range(0, 4096, 7):
+            pos = idx2pos(idx)
+            self.assertEqual(self.section.block(*pos), self.reference.block(*pos))
+        self.assertFalse(self.section.expanded)
+
+    def test_2(self):
+        """ Compact sections fill whole planes without expanding
+        """
+        for section in (self.section, self.reference):
+            section.fill(range(0,16), range(3,5), range(0,16), Name="minecraft:dirt")
+            section.fill(range(0,16), range(0,1), range(0,16), Name="minecraft:glass")
+        self.assertFalse(self.section.expanded)
+
+        for idx in range(0, 4096, 5):
+            pos = idx2pos(idx)
+            self.assertEqual(self.section.block(*pos), self.reference.block(*pos))
+
+    def test_3(self):
+        """ Compact sections expand for random access
+        """
+        for section in (self.section, self.reference):
+            section.fill(range(2,5), range(3,9), range(4,7), Name="minecraft:dirt")
+        self.assertTrue(self.section.expanded)
+        self.assertEqual(self.section.blocks, self.reference.blocks)
+
+        self.section.collapse()
+        self.assertFalse(self.section.expanded)
+        self.assertEqual(self.section.blocks, self.reference.blocks)
+
+    def test_4(self):
+        """ Compact sections repack to the same NBT data
+        """
+        for section in (self.section, self.reference):
+            section.fill(range(0,16), range(3,5), range(0,16), Name="minecraft:dirt")
+
+        self.assertEqual(list(self.section.toNBT()['BlockStates']), list(self.reference.toNBT()['BlockStates']))
+        self.assertFalse(self.section.expanded)
+
 class TestBlit(unittest.TestCase):
     def test_1(self):
         """ Blitter can copy blocks
@@ -0,0 +1,50 @@
+import unittest
+import os.path
+import warnings
+import shutil
+
+import mynbt.nbt as nbt
+from mynbt.stats import *
+from mynbt.section import Section
+from mynbt.world import World
+from test.data.simplechunk import SECTION
+
+SIMPLE_CHUNK=os.path.join('test','data','simplechunk-r.0.0.mca')
+STATS_WORLD=os.path.join('test','tmp','stats-World')
+
+class TestHistogram(unittest.TestCase):
+    def test_1(self):
+        """ Section histograms count every block
+        """
+        section = Section.fromNBT(0,0,nbt.Node.fromNativeObject(SECTION))
+        histogram = section_histogram(section)
+
+        self.assertEqual(sum(histogram.values()), 4096)
+        self.assertEqual(histogram["minecraft:magma_block"], 1)
+        self.assertEqual(histogram["minecraft:glass"], 1)
+
+    def test_2(self):
+        """ Uniform sections are counted without unpacking the blocks
+        """
+        section = Section.fromNBT(0,0,nbt.Node.fromNativeObject(dict(
+            Y=1, Palette=[dict(Name="minecraft:stone")], BlockStates=[1<<40]*256
+        )))
+        self.assertEqual(section_histogram(section), {"minecraft:stone": 4096})
+        self.assertIsNone(section._buffer)
+
+    def test_3(self):
+        """ World histograms are the same when computed in parallel
+        """
+        shutil.rmtree(STATS_WORLD, ignore_errors=True)
+        os.makedirs(os.path.join(STATS_WORLD, 'region'))
+        for rx in (0, 1):
+            shutil.copy(SIMPLE_CHUNK, os.path.join(STATS_WORLD, 'region', 'r.{}.0.mca'.format(rx)))
+
+        world = World(STATS_WORLD)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            sequential = world_histogram(world)
+            parallel = world_histogram(world, workers=2)
+
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(sequential["minecraft:magma_block"], 2)
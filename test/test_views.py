@@ -0,0 +1,148 @@
+import unittest
+import os.path
+
+from array import array
+
+from mynbt.anvil import Anvil
+from mynbt.nbt import parse, dumps
+from mynbt.poi import records, move_records
+from mynbt.region import move_level
+from mynbt.views import *
+
+SIMPLE_CHUNK=os.path.join('test','data','simplechunk-r.0.0.mca')
+
+def payload(path, x, z):
+    region = Anvil.fromFile(0,0,path)
+    length, decompressor, data = region.parse_chunk_header(region.chunk_info(x, z))
+    return bytes(decompressor(data))
+
+class TestLevel(unittest.TestCase):
+    def setUp(self):
+        self.source = payload(SIMPLE_CHUNK, 2, 1)
+
+    def test_1(self):
+        """ Views decode the same values as the tree
+        """
+        tree = parse(self.source)[0]
+        level = Level(tree['Level'])
+
+        self.assertEqual(level.xPos, tree.Level.xPos)
+        self.assertEqual(level.Status, tree.Level.Status)
+        self.assertEqual(len(level.Sections), len(tree.Level.Sections))
+        self.assertEqual([ section.Y for section in level.Sections ],
+                         [ section.Y for section in tree.Level.Sections ])
+
+        entity = level.Entities[0]
+        self.assertEqual(entity.id, tree.Level.Entities[0].id)
+        self.assertEqual(entity.Pos, list(tree.Level.Entities[0].Pos))
+        self.assertEqual(level.TileEntities, [])
+        self.assertIsNone(level.Sections[0].BlockStates)
+
+    def test_2(self):
+        """ Views have no instance dictionary
+        """
+        level = Level(parse(self.source)[0]['Level'])
+        with self.assertRaises(AttributeError):
+            level.other = 1
+        self.assertFalse(hasattr(level, '__dict__'))
+
+    def test_3(self):
+        """ Views track their modified fields
+        """
+        level = Level(parse(self.source)[0]['Level'])
+        level.xPos = level.xPos
+        level.Entities[0].Pos = list(level.Entities[0].Pos)
+        self.assertFalse(level.dirty)
+
+        level.Entities[0].Pos = [0.5, 1.0, 2.5]
+        self.assertTrue(level.dirty)
+        self.assertTrue(level.Entities[0].dirty)
+
+        with self.assertRaises(AttributeError):
+            level.Entities = []
+
+    def test_4(self):
+        """ Flushing patches trees parsed from writable buffers in place
+        """
+        source = bytearray(self.source)
+        tree = parse(source)[0]
+        level = Level(tree['Level'])
+        level.xPos = 42
+        level.Entities[0].Pos = [0.5, 1.0, 2.5]
+
+        self.assertTrue(level.flush(in_place=True))
+        self.assertFalse(level.dirty)
+        self.assertIsNotNone(tree._payload)
+        self.assertIs(tree.dump().obj, source)
+
+        tree = parse(source)[0]
+        self.assertEqual(tree.Level.xPos, 42)
+        self.assertEqual(list(tree.Level.Entities[0].Pos), [0.5, 1.0, 2.5])
+
+    def test_5(self):
+        """ Read-only trees are updated by replacing their nodes
+        """
+        tree = parse(self.source)[0]
+        level = Level(tree['Level'])
+        level.zPos = -7
+        level.Entities[0].Pos = [0.5, 1.0, 2.5]
+
+        self.assertFalse(level.flush(in_place=True))
+        self.assertTrue(level.dirty)
+
+        self.assertTrue(level.flush())
+        self.assertFalse(level.dirty)
+        self.assertIsNone(tree._payload)
+
+        tree = parse(tree.dump())[0]
+        self.assertEqual(tree.Level.zPos, -7)
+        self.assertEqual(list(tree.Level.Entities[0].Pos), [0.5, 1.0, 2.5])
+
+    def test_6(self):
+        """ Entities without a valid position are not moved
+        """
+        data = { 'Level': { 'xPos': 0, 'zPos': 0,
+            'Entities': [ { 'id': 'a' }, { 'id': 'b', 'Pos': [1.0, 2.0] },
+                          { 'id': 'c', 'Pos': [1.0, 2.0, 3.0] } ],
+            'TileEntities': [ { 'id': 'd', 'y': 5 }, { 'id': 'e', 'x': 1, 'y': 5, 'z': 2 } ],
+        } }
+        level = Level(parse(bytearray(dumps(data)))[0]['Level'])
+        move_level(level, 2, -1)
+
+        self.assertEqual([ entity.Pos for entity in level.Entities ],
+                         [ None, [1.0, 2.0], [33.0, 2.0, -13.0] ])
+        self.assertEqual([ (entity.x, entity.z) for entity in level.TileEntities ],
+                         [ (None, None), (33, -14) ])
+
+class TestRecord(unittest.TestCase):
+    def tree(self, pos):
+        data = { 'Data': { 'Sections': { '1': { 'Records': [
+            { 'pos': pos, 'type': 'minecraft:home', 'free_tickets': 1 },
+        ] } } } }
+        return parse(bytearray(dumps(data)))[0]
+
+    def test_1(self):
+        """ POI positions can be stored as int arrays or lists
+        """
+        for pos in (array('i', [33, 64, 17]), [33, 64, 17]):
+            tree = self.tree(pos)
+            record, = records(tree)
+            self.assertEqual(list(record.pos), [33, 64, 17])
+            self.assertEqual(record.type, 'minecraft:home')
+
+            record.pos = [1, 64, 2]
+            self.assertTrue(record.flush(in_place=True))
+            record, = records(parse(tree.dump())[0])
+            self.assertEqual(list(record.pos), [1, 64, 2])
+
+    def test_2(self):
+        """ Records without a valid position are not moved
+        """
+        for pos in (None, [1, 64]):
+            data = { 'Data': { 'Sections': { '1': { 'Records': [
+                { 'type': 'minecraft:home' } if pos is None else { 'pos': pos, 'type': 'minecraft:home' },
+            ] } } } }
+            record, = records(parse(bytearray(dumps(data)))[0])
+            move_records([record], 2, -1)
+            self.assertEqual(record.pos if pos is None else list(record.pos), pos)
+            self.assertFalse(record.dirty)
@@ -184,6 +184,12 @@ class TestWorld(unittest.TestCase):
         self.assertEqual(len(l), 16)
 
 
+    def test_6(self):
+        """ World lists its region files
+        """
+        self.assertEqual(self.world.region_coords(), [(-1,-1), (-1,0), (0,-1), (0,0)])
+
+
 class TestWorldEditor(unittest.TestCase):
     def setUp(self):
         shutil.rmtree(MC_COPY_WORLD, ignore_errors=True)
@@ -231,3 +237,57 @@ class TestWorldEditor(unittest.TestCase):
                 for row in xz_plane(copy, y):
                     # pprint(row)
                     self.assertEqual(row, (1,2,1))
+
+    def test_4(self):
+        """ Editor can fill sections missing from the chunk
+        """
+        r = (range(0, 4), range(200, 204), range(0, 4))
+        with self.world.editor as editor:
+            editor.fill(*r, Name="minecraft:stone")
+
+        world2 = world.World(MC_COPY_WORLD)
+        for x in r[0]:
+            self.assertEqual(world2.block(x, 201, 2), dict(Name="minecraft:stone"))
+        self.assertEqual(world2.block(5, 201, 2), dict(Name="minecraft:air"))
+
+    def test_5(self):
+        """ Streaming editor saves and releases regions as it goes
+        """
+        rx = range(-1,33)
+        ry = range(0,32)
+        rz = range(100,122)
+        blk = dict(Name="minecraft:dirt")
+        progress = []
+
+        with self.world.stream_editor(progress=lambda *args: progress.append(args)) as editor:
+            editor.fill(rx,ry,rz, **blk)
+            self.assertEqual(len(editor._cache), 0)
+            self.assertEqual(len(editor.chunk_cache), 0)
+
+        self.assertEqual(progress, [(1, 2, (-1, 0)), (2, 2, (0, 0))])
+        for x in (-1, 0, 32):
+            self.assertEqual(self.world.block(x,3,110), blk)
+
+    def test_6(self):
+        """ Editor caps the number of open regions
+        """
+        with world.ChangeSet(self.world, max_regions=1) as editor:
+            editor.region(0,0)
+            editor.region(-1,0)
+            self.assertEqual(list(editor._cache), [(-1,0)])
+
+    def test_7(self):
+        """ Editor can process regions in parallel
+        """
+        rx = range(-1,33)
+        ry = range(0,32)
+        rz = range(100,122)
+        blk = dict(Name="minecraft:dirt")
+
+        with self.world.editor as editor:
+            stats = editor.fill(rx,ry,rz, workers=2, **blk)
+
+        self.assertEqual(stats, world.ApplyStats(2, 8, 16))
+        for x in (-1, 0, 32):
+            for y in (0, 31):
+                self.assertEqual(self.world.block(x,y,110), blk)